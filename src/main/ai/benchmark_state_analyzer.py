@@ -0,0 +1,51 @@
+import time
+from state_analyzer import StateAnalyzer
+
+SAMPLE_MESSAGES = [
+    "Hello, how are you?",
+    "I'm really anxious about my exams and I can't stop worrying",
+    "I feel so tired and empty lately, nothing seems to matter",
+    "My partner and I had a big conflict and I'm frustrated",
+    "I miss my grandmother, she passed away last month",
+    "Sometimes I feel like a failure and not good enough",
+    "I've decided to end it all tonight",
+    "Work has been quite stressful but I'm managing, maybe it will get better",
+    "I had a nightmare again and it keeps triggering flashbacks from the assault",
+    "Honestly I think things are okay, just wanted to check in and say hi to you this evening",
+]
+
+def legacy_analyze(analyzer: StateAnalyzer, message: str):
+    """Three separate scans, as analyze_message did before the scoring engine."""
+    message = message.lower()
+    emotion = analyzer._detect_primary_emotion(message)
+    intensity = analyzer._calculate_intensity(message)
+    risk_level = analyzer._assess_risk(message, emotion, intensity)
+    return emotion, intensity, risk_level
+
+def engine_analyze(analyzer: StateAnalyzer, message: str):
+    state = analyzer.analyze_message(message)
+    return state.primary_emotion, state.intensity, state.risk_level
+
+def measure(analyze, analyzer: StateAnalyzer, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in SAMPLE_MESSAGES:
+            analyze(analyzer, message)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(SAMPLE_MESSAGES)) * 1e6
+
+def main(rounds: int = 2000):
+    analyzer = StateAnalyzer()
+
+    for message in SAMPLE_MESSAGES:
+        assert legacy_analyze(analyzer, message) == engine_analyze(analyzer, message), message
+    print(f"Results identical for {len(SAMPLE_MESSAGES)} sample messages")
+
+    before = measure(legacy_analyze, analyzer, rounds)
+    after = measure(engine_analyze, analyzer, rounds)
+    print(f"Before (per-pattern scans): {before:.1f} µs/message")
+    print(f"After (single-scan engine): {after:.1f} µs/message")
+    print(f"Speedup: {before / after:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+class HashedEmotionClassifier:
+    """Linear (softmax) emotion classifier over hashed word n-gram features.
+
+    Weights are a ``(n_features + 1, n_labels)`` float32 matrix; the last row is
+    the bias. Scoring gathers the weight rows of each message's hashed features
+    and sums them with ``np.add.reduceat``, so a whole batch of messages is scored
+    in one vectorized call. Training uses the same sparse layout and never
+    builds a dense feature matrix.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        n_features: int = 2 ** 14,
+        ngram_range: Tuple[int, int] = (1, 2),
+        weights: Optional[np.ndarray] = None
+    ):
+        self.labels = list(labels)
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.weights = (
+            weights if weights is not None
+            else np.zeros((n_features + 1, len(self.labels)), dtype=np.float32)
+        )
+
+    def _hash(self, feature: str) -> int:
+        return zlib.crc32(feature.encode('utf-8')) % self.n_features
+
+    def _message_features(self, message: str) -> List[int]:
+        tokens = TOKEN_PATTERN.findall(message.lower())
+        low, high = self.ngram_range
+        features = []
+        for n in range(low, high + 1):
+            for start in range(len(tokens) - n + 1):
+                features.append(self._hash(' '.join(tokens[start:start + n])))
+        # Every message carries the bias feature, so no message has an empty row
+        features.append(self.n_features)
+        return features
+
+    def featurize(self, messages: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the flat feature indices of all messages and each message's start offset."""
+        indices: List[int] = []
+        offsets = np.empty(len(messages), dtype=np.int64)
+        for row, message in enumerate(messages):
+            offsets[row] = len(indices)
+            indices.extend(self._message_features(message))
+        return np.asarray(indices, dtype=np.int64), offsets
+
+    def transform(self, messages: Sequence[str]) -> np.ndarray:
+        """Dense feature matrix; only for inspection, as it is ``n_features`` wide."""
+        indices, offsets = self.featurize(messages)
+        rows = np.repeat(np.arange(len(messages)), np.diff(np.append(offsets, len(indices))))
+        matrix = np.zeros((len(messages), self.n_features + 1), dtype=np.float32)
+        np.add.at(matrix, (rows, indices), 1.0)
+        return matrix
+
+    def fit(
+        self,
+        messages: Sequence[str],
+        labels: Sequence[str],
+        epochs: int = 200,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4
+    ) -> "HashedEmotionClassifier":
+        indices, offsets = self.featurize(messages)
+        # The message each feature occurrence belongs to
+        rows = np.repeat(np.arange(len(messages)), np.diff(np.append(offsets, len(indices))))
+        targets = np.zeros((len(messages), len(self.labels)), dtype=np.float32)
+        targets[np.arange(len(messages)), [self.labels.index(label) for label in labels]] = 1.0
+
+        weights = np.zeros((self.n_features + 1, len(self.labels)), dtype=np.float32)
+        for _ in range(epochs):
+            probabilities = self._softmax(np.add.reduceat(weights[indices], offsets, axis=0))
+            errors = (probabilities - targets) / len(messages)
+            # features.T @ errors, scattered straight into the rows that occur
+            gradient = l2 * weights
+            np.add.at(gradient, indices, errors[rows])
+            weights -= learning_rate * gradient
+        self.weights = weights
+        return self
+
+    def decision_function(self, messages: Sequence[str]) -> np.ndarray:
+        indices, offsets = self.featurize(messages)
+        if not len(messages):
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.add.reduceat(self.weights[indices], offsets, axis=0)
+
+    def predict_proba(self, messages: Sequence[str]) -> np.ndarray:
+        return self._softmax(self.decision_function(messages))
+
+    def predict(self, messages: Sequence[str]) -> List[str]:
+        return [self.labels[index] for index in self.decision_function(messages).argmax(axis=1)]
+
+    def save(self, path: Path):
+        """Write the weights to ``path`` (.npy) and the metadata next to it (.json)."""
+        path = Path(path)
+        np.save(path, np.ascontiguousarray(self.weights, dtype=np.float32))
+        path.with_suffix('.json').write_text(json.dumps({
+            "labels": self.labels,
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range)
+        }))
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "HashedEmotionClassifier":
+        path = Path(path)
+        metadata = json.loads(path.with_suffix('.json').read_text())
+        weights = np.load(path, mmap_mode='r' if mmap else None)
+        return cls(
+            labels=metadata["labels"],
+            n_features=metadata["n_features"],
+            ngram_range=tuple(metadata["ngram_range"]),
+            weights=weights
+        )
+
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return shifted / shifted.sum(axis=1, keepdims=True)
+
+def main():
+    """Fit weights from a JSONL file of {"message": ..., "label": ...} examples."""
+    if len(sys.argv) != 3:
+        print("Usage: python emotion_classifier.py <examples.jsonl> <weights.npy>")
+        sys.exit(1)
+
+    examples = [json.loads(line) for line in Path(sys.argv[1]).read_text().splitlines() if line.strip()]
+    messages = [example["message"] for example in examples]
+    labels = [example["label"] for example in examples]
+
+    classifier = HashedEmotionClassifier(labels=sorted(set(labels))).fit(messages, labels)
+    classifier.save(Path(sys.argv[2]))
+    print(f"Saved weights for {len(classifier.labels)} labels to {sys.argv[2]}")
+
+if __name__ == "__main__":
+    main()
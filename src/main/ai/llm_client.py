@@ -1,8 +1,13 @@
 import aiohttp
 import json
 import logging
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Union
 from pathlib import Path
+try:
+    from .response_cache import ResponseCache
+except ImportError:
+    # Imported as a top-level module by the scripts and tests in ai/
+    from response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -10,11 +15,46 @@ class LLMClient:
     def __init__(
         self,
         base_url: str = "http://127.0.0.1:1234",
-        system_prompt_path: Optional[Path] = None
+        system_prompt_path: Optional[Path] = None,
+        connection_limit: int = 4,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 60.0,
+        response_cache: Optional[ResponseCache] = None
     ):
         self.base_url = base_url
+        self.response_cache = response_cache
         self.headers = {"Content-Type": "application/json"}
         self.system_prompt = self._load_system_prompt(system_prompt_path)
+        self.connection_limit = connection_limit
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Open the session shared by every request for the client's lifetime."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        await self.start()
+        return self._session
         
     def _load_system_prompt(self, path: Optional[Path]) -> str:
         if not path:
@@ -25,37 +65,65 @@ class LLMClient:
             logger.error(f"Failed to load system prompt: {e}")
             return ""
 
+    def _messages(self, prompt: Union[str, List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """A string is sent as one user turn after the client's system prompt; a
+        list is the complete message array, e.g. from TherapeuticPromptManager,
+        which must already start with its system message. Pass ``system_prompt``
+        to TherapeuticPromptManager so list prompts use the prompt file too."""
+        if isinstance(prompt, list):
+            return prompt
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
     async def generate_response(
         self,
-        user_message: str,
+        user_message: Union[str, List[Dict[str, str]]],
         temperature: float = 0.6,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        response_format: Optional[Dict] = None,
+        cacheable: bool = False
     ) -> Dict:
-        """Generate a response using LM Studio's local API."""
+        """Generate a response using LM Studio's local API.
+
+        Pass ``cacheable`` only for turns with a normal safety result; those may be
+        answered from the response cache."""
+        messages = self._messages(user_message)
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key, cached = self.response_cache.lookup(
+                cacheable, messages,
+                temperature=temperature, max_tokens=max_tokens, response_format=response_format
+            )
+            if cached is not None:
+                return cached
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "messages": [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                }
+            session = await self._get_session()
+            payload = {
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": False
+            }
+            if response_format:
+                # Constrain generation to a JSON schema on servers that support it
+                payload["response_format"] = response_format
+            
+            async with session.post(
+                f"{self.base_url}/v1/chat/completions",
+                headers=self.headers,
+                json=payload
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"API Error: {error_text}")
                 
-                async with session.post(
-                    f"{self.base_url}/v1/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"API Error: {error_text}")
-                    
-                    result = await response.json()
-                    # Return the raw response instead of parsing the content
-                    return result
+                result = await response.json()
+                if cache_key is not None:
+                    self.response_cache.put(cache_key, result)
+                # Return the raw response instead of parsing the content
+                return result
                     
         except Exception as e:
             logger.error(f"Error generating response: {e}")
@@ -73,6 +141,50 @@ class LLMClient:
                 }]
             }
 
+    async def stream_response(
+        self,
+        user_message: Union[str, List[Dict[str, str]]],
+        temperature: float = 0.6,
+        max_tokens: int = 1000,
+        response_format: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Yield content deltas as LM Studio generates them.
+
+        Errors are raised rather than replaced with a fallback, because part of
+        the reply may already have been shown."""
+        session = await self._get_session()
+        payload = {
+            "messages": self._messages(user_message),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        if response_format:
+            payload["response_format"] = response_format
+        
+        async with session.post(
+            f"{self.base_url}/v1/chat/completions",
+            headers=self.headers,
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"API Error: {error_text}")
+            
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
     async def test_connection(self) -> bool:
         """Test if LM Studio API is accessible."""
         try:
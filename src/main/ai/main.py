@@ -4,12 +4,19 @@ import asyncio
 import logging
 import json
 import re
-from typing import Dict, List
+import time
+from typing import AsyncIterator, Dict, List, Optional
 from pathlib import Path
 from ai.llm_client import LLMClient
+from ai.response_cache import ResponseCache
 from ai.prompt_manager import TherapeuticPromptManager
 from ai.session_manager import TherapeuticSession, SessionState
 from ai.state_analyzer import StateAnalyzer, EmotionalState
+from ai.stream_parser import IncrementalJSONFieldParser
+from ai.response_schema import (
+    TherapeuticResponse, ResponseParseStats, RESPONSE_FORMAT, DisplayStream, format_response_for_display
+)
+from pydantic import ValidationError
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,11 +25,39 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class MindfulCompanion:
-    def __init__(self):
-        self.llm_client = LLMClient()
-        self.prompt_manager = TherapeuticPromptManager()
+    def __init__(
+        self,
+        classifier_path: Optional[Path] = None,
+        system_prompt_path: Optional[Path] = None,
+        stream: bool = False,
+        structured_output: bool = False,
+        crisis_follow_up: bool = True
+    ):
+        self.stream = stream
+        # After the immediate crisis response, also generate a personalized reply
+        self.crisis_follow_up = crisis_follow_up
+        self.pending_follow_up: Optional[asyncio.Task] = None
+        # Ask the server to constrain output to the response JSON schema
+        self.response_format = RESPONSE_FORMAT if structured_output else None
+        self.parse_stats = ResponseParseStats()
+        # Like the app, only turns without crisis or immediate-risk patterns are looked up or stored
+        self.response_cache = ResponseCache()
+        self.llm_client = LLMClient(system_prompt_path=system_prompt_path, response_cache=self.response_cache)
+        # The prompt file, if any, is the stable prefix of every turn's messages
+        self.prompt_manager = TherapeuticPromptManager(self.llm_client.system_prompt.strip() or None)
         self.session = TherapeuticSession()
-        self.state_analyzer = StateAnalyzer()
+        self.state_analyzer = StateAnalyzer(classifier=self._load_classifier(classifier_path))
+
+    def _load_classifier(self, path: Optional[Path]):
+        """Load hashed-feature classifier weights, falling back to regex scoring."""
+        if not path:
+            return None
+        try:
+            from ai.emotion_classifier import HashedEmotionClassifier
+            return HashedEmotionClassifier.load(path)
+        except Exception as e:
+            logger.error(f"Failed to load emotion classifier: {e}")
+            return None
         
     async def _get_response(self, user_message: str, emotional_state: EmotionalState) -> Dict:
         """Generate therapeutic response based on comprehensive context"""
@@ -39,7 +74,9 @@ class MindfulCompanion:
             response = await self.llm_client.generate_response(
                 prompt,
                 temperature=self._determine_temperature(emotional_state, context['state']),
-                max_tokens=750
+                max_tokens=750,
+                response_format=self.response_format,
+                cacheable=not emotional_state.risk_patterns_matched
             )
             
             result = self._process_llm_response(response)
@@ -81,14 +118,16 @@ class MindfulCompanion:
         # Simple implementation - can be enhanced with NLP
         common_themes = ['anxiety', 'depression', 'relationships', 'self-esteem', 
                         'grief', 'trauma', 'stress', 'sleep', 'anger']
-        return [theme for theme in common_themes if theme.lower() in text.lower()]
+        text = text.lower()
+        return [theme for theme in common_themes if theme in text]
 
     def _extract_coping_strategies(self, text: str) -> List[str]:
         """Extract mentioned coping strategies from text"""
         # Simple implementation - can be enhanced with NLP
         strategies = ['breathing', 'meditation', 'exercise', 'mindfulness', 
                      'grounding', 'self-care', 'therapy', 'journaling']
-        return [strategy for strategy in strategies if strategy.lower() in text.lower()]
+        text = text.lower()
+        return [strategy for strategy in strategies if strategy in text]
 
     async def process_message(self, user_message: str) -> str:
         try:
@@ -100,6 +139,16 @@ class MindfulCompanion:
             emotional_state = self.state_analyzer.analyze_message(user_message)
             self.session.add_message(user_message, is_user=True, emotional_state=emotional_state)
             
+            if self._is_crisis(emotional_state):
+                # Show the crisis resources now; the model's reply follows when ready
+                crisis_response = self.prompt_manager.create_crisis_response()
+                self.session.add_message(crisis_response, is_user=False)
+                if self.crisis_follow_up:
+                    self.pending_follow_up = asyncio.create_task(
+                        self._crisis_follow_up(user_message, emotional_state)
+                    )
+                return crisis_response
+            
             result = await self._get_response(user_message, emotional_state)
             
             # Format the response for display
@@ -115,53 +164,80 @@ class MindfulCompanion:
             logger.error(f"Error processing message: {str(e)}")
             return "I apologize, but I'm having trouble processing your message. Could you try rephrasing it?"
 
-    def _format_response_for_display(self, response_dict: Dict) -> str:
-        """Convert response dictionary to natural language"""
+    def _is_crisis(self, emotional_state: EmotionalState) -> bool:
+        return self.state_analyzer.get_response_type(emotional_state) == 'crisis_intervention'
+
+    async def _crisis_follow_up(self, user_message: str, emotional_state: EmotionalState) -> str:
+        result = await self._get_response(user_message, emotional_state)
+        formatted_response = self._format_response_for_display(result)
+        self.session.add_message(formatted_response, is_user=False)
+        return formatted_response
+
+    async def next_follow_up(self) -> Optional[str]:
+        """Wait for the personalized reply to the last crisis message, if one is pending."""
+        task, self.pending_follow_up = self.pending_follow_up, None
+        if task is None:
+            return None
         try:
-            if not isinstance(response_dict, dict):
-                return str(response_dict)
-            
-            parts = []
-            
-            # Build response naturally
-            if response_dict.get("reflection"):
-                parts.append(response_dict["reflection"].strip())
-            
-            if response_dict.get("validation"):
-                validation = response_dict["validation"].strip()
-                if not any(validation.lower().startswith(word) for word in ['and', 'also', 'additionally']):
-                    parts.append(validation)
-            
-            if response_dict.get("support"):
-                support = response_dict["support"].strip()
-                if not any(support.lower().startswith(word) for word in ['and', 'also', 'additionally']):
-                    parts.append(support)
-            
-            if response_dict.get("question"):
-                question = response_dict["question"].strip()
-                if not any(question.lower().startswith(word) for word in ['and', 'also', 'additionally']):
-                    parts.append(question)
-            
-            if response_dict.get("safety_note"):
-                safety = response_dict["safety_note"].strip()
-                if safety:
-                    parts.append(f"\nIMPORTANT: {safety}")
-            
-            # Join parts with proper spacing and punctuation
-            response = '. '.join(filter(None, parts))
-            response = response.replace('..', '.')  # Remove double periods
-            response = re.sub(r'\s+', ' ', response).strip()  # Clean up whitespace
-            
-            # Ensure proper sentence capitalization
-            sentences = response.split('. ')
-            sentences = [s.strip().capitalize() for s in sentences if s.strip()]
-            response = '. '.join(sentences)
-            
-            return response
-            
+            return await task
+        except Exception as e:
+            logger.error(f"Error generating crisis follow-up: {str(e)}")
+            return None
+
+    async def stream_message(self, user_message: str) -> AsyncIterator[str]:
+        """Yield display-ready parts of the response as each JSON field completes"""
+        if not user_message or not user_message.strip():
+            yield "I didn't catch that. Could you please say something?"
+            return
+
+        emotional_state = self.state_analyzer.analyze_message(user_message)
+        self.session.add_message(user_message, is_user=True, emotional_state=emotional_state)
+
+        if self._is_crisis(emotional_state):
+            # The crisis resources go out before the model is called
+            crisis_response = self.prompt_manager.create_crisis_response()
+            self.session.add_message(crisis_response, is_user=False)
+            yield crisis_response + "\n\n"
+            if not self.crisis_follow_up:
+                return
+
+        context = self.session.get_session_context()
+        prompt = self.prompt_manager.create_therapeutic_prompt(
+            user_message,
+            emotional_state,
+            context
+        )
+
+        parser = IncrementalJSONFieldParser()
+        display = DisplayStream()
+        result = {}
+        try:
+            async for delta in self.llm_client.stream_response(
+                prompt,
+                temperature=self._determine_temperature(emotional_state, context['state']),
+                max_tokens=750,
+                response_format=self.response_format
+            ):
+                for field, value in parser.feed(delta):
+                    result[field] = value
+                    part = display.add(field, value)
+                    if part:
+                        yield part
         except Exception as e:
-            logger.error(f"Error formatting response: {e}")
-            return "I'm here to listen and support you. Would you like to share more?"
+            logger.error(f"Error streaming response: {str(e)}")
+
+        if not result:
+            # No field closed while streaming; fall back to parsing the whole output
+            result = self._process_llm_response(parser.text)
+        rest = display.finish(result)
+        if rest:
+            yield rest
+
+        self.session.add_message(self._format_response_for_display(result), is_user=False)
+
+    def _format_response_for_display(self, response_dict: Dict) -> str:
+        """Convert response dictionary to natural language"""
+        return format_response_for_display(response_dict)
 
     async def run_interactive_session(self):
         welcome_message = {
@@ -189,10 +265,25 @@ class MindfulCompanion:
                 print("\nMindfulCompanion:", self._format_response_for_display(farewell))
                 print("\nSession Summary:")
                 print(json.dumps(self.session.get_session_summary(), indent=2))
+                logger.info(f"Response parsing: {self.parse_stats.as_dict()}")
+                logger.info(f"Response cache: {self.response_cache.stats()}")
+                logger.info(f"Prompt prefix reuse: {self.prompt_manager.prompt_builder.stats()}")
                 break
             
+            if self.stream:
+                # Print each part of the response as soon as it is generated
+                print("\nMindfulCompanion: ", end="", flush=True)
+                async for part in self.stream_message(user_input):
+                    print(part, end="", flush=True)
+                print("\n")
+                continue
+            
             response = await self.process_message(user_input)
             print("\nMindfulCompanion:", response, "\n")
+            
+            follow_up = await self.next_follow_up()
+            if follow_up:
+                print("MindfulCompanion:", follow_up, "\n")
 
     def _process_llm_response(self, response: str) -> Dict:
         """Helper method to process and clean LLM response"""
@@ -205,44 +296,21 @@ class MindfulCompanion:
 
             # Clean up the content
             content = content.strip()
+            self.parse_stats.responses += 1
             
-            # Try to find JSON structure
+            # Fast path: one validated parse of a well-formed response
             try:
-                # First attempt: direct JSON parsing
-                return json.loads(content)
-            except json.JSONDecodeError:
-                # Second attempt: Find JSON-like structure and clean it
-                json_pattern = r'\{[\s\S]*\}'
-                matches = re.search(json_pattern, content)
-                
-                if matches:
-                    json_str = matches.group(0)
-                    
-                    # Clean up the JSON string
-                    json_str = re.sub(r'[\n\r]', '', json_str)  # Remove newlines
-                    json_str = re.sub(r',\s*([\]}])', r'\1', json_str)  # Fix trailing commas
-                    json_str = re.sub(r'([{,])\s*([^"{\s])', r'\1"\2', json_str)  # Add missing quotes to keys
-                    json_str = re.sub(r'([^"}]),\s*([^"{\s])', r'\1,"\2', json_str)  # Add missing quotes to subsequent keys
-                    
-                    try:
-                        return json.loads(json_str)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to parse cleaned JSON: {e}")
-                
-                # If all parsing attempts fail, extract components manually
-                reflection_match = re.search(r'"reflection":\s*"([^"]*)"', content)
-                validation_match = re.search(r'"validation":\s*"([^"]*)"', content)
-                support_match = re.search(r'"support":\s*"([^"]*)"', content)
-                question_match = re.search(r'"question":\s*"([^"]*)"', content)
-                safety_match = re.search(r'"safety_note":\s*"([^"]*)"', content)
-                
-                return {
-                    "reflection": reflection_match.group(1) if reflection_match else "I understand your situation",
-                    "validation": validation_match.group(1) if validation_match else "Your feelings are valid",
-                    "support": support_match.group(1) if support_match else "Let's work through this together",
-                    "question": question_match.group(1) if question_match else "Would you like to tell me more?",
-                    "safety_note": safety_match.group(1) if safety_match else ""
-                }
+                result = TherapeuticResponse.model_validate_json(content).model_dump()
+                self.parse_stats.parsed += 1
+                return result
+            except ValidationError:
+                self.parse_stats.parse_failures += 1
+            
+            repair_started = time.perf_counter()
+            try:
+                return self._repair_llm_response(content)
+            finally:
+                self.parse_stats.repair_seconds += time.perf_counter() - repair_started
         
         except Exception as e:
             logger.error(f"Error processing LLM response: {str(e)}")
@@ -255,6 +323,51 @@ class MindfulCompanion:
                 "safety_note": ""
             }
 
+    def _repair_llm_response(self, content: str) -> Dict:
+        """Recover a response dict from output that is not schema-valid JSON"""
+        # Try to find JSON structure
+        try:
+            # First attempt: direct JSON parsing
+            result = json.loads(content)
+            self.parse_stats.repaired += 1
+            return result
+        except json.JSONDecodeError:
+            # Second attempt: Find JSON-like structure and clean it
+            json_pattern = r'\{[\s\S]*\}'
+            matches = re.search(json_pattern, content)
+            
+            if matches:
+                json_str = matches.group(0)
+                
+                # Clean up the JSON string
+                json_str = re.sub(r'[\n\r]', '', json_str)  # Remove newlines
+                json_str = re.sub(r',\s*([\]}])', r'\1', json_str)  # Fix trailing commas
+                json_str = re.sub(r'([{,])\s*([^"{\s])', r'\1"\2', json_str)  # Add missing quotes to keys
+                json_str = re.sub(r'([^"}]),\s*([^"{\s])', r'\1,"\2', json_str)  # Add missing quotes to subsequent keys
+                
+                try:
+                    result = json.loads(json_str)
+                    self.parse_stats.repaired += 1
+                    return result
+                except json.JSONDecodeError as e:
+                    logger.error(f"Failed to parse cleaned JSON: {e}")
+            
+            # If all parsing attempts fail, extract components manually
+            self.parse_stats.fallbacks += 1
+            reflection_match = re.search(r'"reflection":\s*"([^"]*)"', content)
+            validation_match = re.search(r'"validation":\s*"([^"]*)"', content)
+            support_match = re.search(r'"support":\s*"([^"]*)"', content)
+            question_match = re.search(r'"question":\s*"([^"]*)"', content)
+            safety_match = re.search(r'"safety_note":\s*"([^"]*)"', content)
+            
+            return {
+                "reflection": reflection_match.group(1) if reflection_match else "I understand your situation",
+                "validation": validation_match.group(1) if validation_match else "Your feelings are valid",
+                "support": support_match.group(1) if support_match else "Let's work through this together",
+                "question": question_match.group(1) if question_match else "Would you like to tell me more?",
+                "safety_note": safety_match.group(1) if safety_match else ""
+            }
+
     def _determine_temperature(self, emotional_state: EmotionalState, session_state: str) -> float:
         """Determine the appropriate temperature based on emotional state and session state."""
         if session_state == 'crisis':
@@ -266,12 +379,35 @@ class MindfulCompanion:
         else:
             return 0.4  # Balanced for regular conversation
 
+def option_value(name: str) -> Optional[str]:
+    """Value following ``name`` on the command line, e.g. ``--classifier weights.npy``."""
+    if name not in sys.argv:
+        return None
+    index = sys.argv.index(name) + 1
+    if index >= len(sys.argv) or sys.argv[index].startswith("--"):
+        print(
+            "Usage: python -m ai.main [--classifier PATH] [--system-prompt PATH] "
+            "[--stream] [--structured] [--no-crisis-follow-up]"
+        )
+        sys.exit(1)
+    return sys.argv[index]
+
 async def main():
     logger.info("Starting MindfulCompanion...")
-    companion = MindfulCompanion()
+    # Weights trained with ai/emotion_classifier.py replace the regex emotion scoring
+    classifier_path = option_value("--classifier")
+    system_prompt_path = option_value("--system-prompt")
+    companion = MindfulCompanion(
+        classifier_path=Path(classifier_path) if classifier_path else None,
+        system_prompt_path=Path(system_prompt_path) if system_prompt_path else None,
+        stream="--stream" in sys.argv,
+        structured_output="--structured" in sys.argv,
+        crisis_follow_up="--no-crisis-follow-up" not in sys.argv
+    )
     
-    # Run the interactive session directly
-    await companion.run_interactive_session()
+    # Run the interactive session directly, reusing one LLM session for every turn
+    async with companion.llm_client:
+        await companion.run_interactive_session()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,59 @@
+import re
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+REGEX_QUANTIFIERS = set('*+?{')
+
+def literal_first_char(pattern: str) -> Optional[str]:
+    """The character every match of ``pattern`` starts with, or None if it is not fixed."""
+    first = pattern[:1]
+    if not first or first in REGEX_METACHARACTERS or '|' in pattern:
+        return None
+    if pattern[1:2] in REGEX_QUANTIFIERS:
+        # 's?elf harm' can start with 'e' and 'a*b' with 'b'
+        return None
+    return first
+
+class PatternIndex:
+    """Finds every pattern of a list that matches at each offset, in one pass.
+
+    All patterns are compiled into a single alternation. The alternation only
+    reports the first pattern matching at an offset, so each hit is resolved by
+    re-checking the patterns that can start there; patterns are indexed by
+    their literal first character to keep that set small. Shared by the app's
+    SafetyMonitor and the CLI's StateAnalyzer.
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self.compiled = [re.compile(pattern) for pattern in self.patterns]
+        self._by_first_char: Dict[str, List[int]] = {}
+        self._any_start: List[int] = []
+        for index, pattern in enumerate(self.patterns):
+            first = literal_first_char(pattern)
+            if first is None:
+                self._any_start.append(index)
+            else:
+                self._by_first_char.setdefault(first, []).append(index)
+        # Non-capturing groups keep the combined pattern on the regex engine's fast path
+        self._combined = re.compile('|'.join(f'(?:{pattern})' for pattern in self.patterns))
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, 're.Match']]:
+        """Yield (pattern index, match) for every pattern matching at every offset.
+
+        Matches come in offset order and, at one offset, in pattern order. Overlapping
+        matches are all reported, since the search resumes one character on."""
+        position = 0
+        while position <= len(text):
+            hit = self._combined.search(text, position)
+            if not hit:
+                return
+            start = hit.start()
+            candidates = self._by_first_char.get(text[start:start + 1], [])
+            if self._any_start:
+                candidates = sorted(candidates + self._any_start)
+            for index in candidates:
+                match = self.compiled[index].match(text, start)
+                if match:
+                    yield index, match
+            position = start + 1
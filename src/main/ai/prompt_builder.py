@@ -0,0 +1,121 @@
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Protocol, Sequence, Tuple
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, close enough to compare a prefix against the whole prompt."""
+    return len(TOKEN.findall(text))
+
+class HistoryMessage(Protocol):
+    """A stored chat message, such as the app's ChatMessage."""
+    id: Optional[int]
+    role: str
+    content: str
+    mood: Optional[str]
+
+def render_user_turn(content: str, mood: Optional[str]) -> str:
+    return f"[Current Mood: {mood}] {content}" if mood else content
+
+class PromptBuilder:
+    """Assembles chat messages from most static to most dynamic content.
+
+    The system message is the base instructions followed by the profile, so the
+    base is a byte-identical prefix for every user. History comes next, then
+    the current turn. Model servers reuse the KV cache for the longest prompt
+    prefix they have already seen, so the history window does not slide one
+    turn at a time: it grows to ``max_history`` messages, then drops back to
+    the newest ``min_history`` in one step. Until that step, each prompt of a
+    conversation starts with the previous one byte for byte.
+
+    ``stats()`` reports the share of prompt tokens that repeat the previous
+    prompt of the same conversation.
+    """
+
+    def __init__(self, base_prompt: str, max_history: int = 10, min_history: int = 4, max_conversations: int = 1024):
+        if not 0 <= min_history <= max_history:
+            raise ValueError("min_history must be between 0 and max_history")
+        self.base_prompt = base_prompt
+        self.max_history = max_history
+        self.min_history = min_history
+        self.max_conversations = max_conversations
+        self.prompts = 0
+        self.prefix_tokens = 0
+        self.total_tokens = 0
+        # conversation -> (id of the first history message in the window, last prompt)
+        self._conversations: "OrderedDict[Hashable, Tuple[Optional[int], List[Dict[str, str]]]]" = OrderedDict()
+
+    def system_prompt(self, profile_context: Optional[str] = None) -> str:
+        return self.base_prompt + profile_context if profile_context else self.base_prompt
+
+    def _window(self, history: Sequence[HistoryMessage], anchor_id: Optional[int]) -> Sequence[HistoryMessage]:
+        if anchor_id is not None:
+            for index, msg in enumerate(history):
+                if msg.id == anchor_id:
+                    if len(history) - index <= self.max_history:
+                        return history[index:]
+                    break
+        elif len(history) <= self.max_history:
+            return history
+        # The window outgrew max_history, or its first message fell out of the
+        # history the caller fetched
+        return history[max(0, len(history) - self.min_history):]
+
+    def build(
+        self,
+        message: str,
+        history: Sequence[HistoryMessage] = (),
+        system_prompt: Optional[str] = None,
+        mood: Optional[str] = None,
+        conversation: Hashable = None
+    ) -> List[Dict[str, str]]:
+        """Messages for one turn. ``system_prompt`` defaults to the base prompt and
+        should come from ``system_prompt()``. ``history`` is oldest first; user
+        messages in it are rendered exactly as they were as the current turn."""
+        anchor_id, previous = self._conversations.get(conversation, (None, []))
+        window = self._window(history, anchor_id)
+
+        messages = [{"role": "system", "content": system_prompt or self.base_prompt}]
+        for msg in window:
+            content = render_user_turn(msg.content, msg.mood) if msg.role == "user" else msg.content
+            messages.append({"role": msg.role, "content": content})
+        messages.append({"role": "user", "content": render_user_turn(message, mood)})
+
+        self._record(messages, previous)
+        # Kept as a copy so callers may modify what they get back
+        self._conversations[conversation] = (window[0].id if window else None, [dict(m) for m in messages])
+        self._conversations.move_to_end(conversation)
+        if len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+        return messages
+
+    def _record(self, messages: List[Dict[str, str]], previous: List[Dict[str, str]]):
+        shared = 0
+        for current, before in zip(messages, previous):
+            if current == before:
+                shared += estimate_tokens(current["content"])
+                continue
+            if current["role"] == before["role"]:
+                common = 0
+                for a, b in zip(current["content"], before["content"]):
+                    if a != b:
+                        break
+                    common += 1
+                shared += estimate_tokens(current["content"][:common])
+            break
+        self.prompts += 1
+        self.prefix_tokens += shared
+        self.total_tokens += sum(estimate_tokens(message["content"]) for message in messages)
+
+    def forget(self, conversation: Hashable):
+        self._conversations.pop(conversation, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prompts": self.prompts,
+            "conversations": len(self._conversations),
+            "prefix_tokens": self.prefix_tokens,
+            "total_tokens": self.total_tokens,
+            "prefix_share": round(self.prefix_tokens / self.total_tokens, 3) if self.total_tokens else 0.0,
+        }
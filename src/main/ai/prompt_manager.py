@@ -1,9 +1,33 @@
 from typing import Dict, Optional, List
+from .prompt_builder import PromptBuilder
 from .state_analyzer import EmotionalState
 
+RESPONSE_INSTRUCTIONS = """Respond with ONLY a JSON object in this exact format:
+
+{
+    "reflection": "I hear that you're feeling [emotion]",
+    "validation": "It's normal to feel this way because [reason]",
+    "support": "Let's try [specific suggestion]",
+    "question": "What [follow-up question]?",
+    "safety_note": ""
+}
+
+Remember:
+1. ONLY output the JSON object
+2. Keep it brief and warm
+3. Be specific and actionable"""
+
+CRISIS_PROTOCOL = """CRISIS PROTOCOL ACTIVATED:
+- Express immediate concern for their safety
+- Provide crisis resources (988 Crisis Line, 911)
+- Encourage professional help
+- Keep response focused on immediate safety"""
+
 class TherapeuticPromptManager:
-    def __init__(self):
-        self.base_system_prompt = """You are MindfulCompanion, a supportive AI wellness companion focused on mental well-being. While you are not a replacement for professional mental health care, you provide:
+    def __init__(self, base_system_prompt: Optional[str] = None):
+        """``base_system_prompt`` replaces the built-in instructions, e.g. with the
+        LLM client's prompt file; the response format instructions always follow."""
+        self.base_system_prompt = base_system_prompt or """You are MindfulCompanion, a supportive AI wellness companion focused on mental well-being. While you are not a replacement for professional mental health care, you provide:
 1. Empathetic, non-judgmental listening
 2. Evidence-based coping strategies
 3. Mindfulness techniques
@@ -22,6 +46,9 @@ Safety Protocol:
 - For any mentions of self-harm or severe distress, prioritize crisis resources
 - Never attempt to diagnose or provide medical advice
 - Be clear about your limitations as an AI companion"""
+        # Everything but the user's turn is static, so the model server can reuse
+        # the prompt prefix across turns
+        self.prompt_builder = PromptBuilder(self.base_system_prompt + "\n\n" + RESPONSE_INSTRUCTIONS)
 
         # Theme-specific response strategies
         self.response_strategies = {
@@ -80,41 +107,12 @@ Safety Protocol:
         user_message: str, 
         emotional_state: EmotionalState, 
         context: dict
-    ) -> str:
-        session_state = context.get('state', 'initial')
-        current_topic = context.get('current_topic', None)
-        
-        # Get relevant strategies based on emotional state
-        strategies = self.response_strategies.get(
-            emotional_state.primary_emotion.lower(),
-            self.response_strategies.get('stress')  # default fallback
-        )
-
-        prompt = f"""You are a supportive AI companion. Respond with ONLY a JSON object in this exact format:
-
-{{
-    "reflection": "I hear that you're feeling [emotion]",
-    "validation": "It's normal to feel this way because [reason]",
-    "support": "Let's try [specific suggestion]",
-    "question": "What [follow-up question]?",
-    "safety_note": ""
-}}
-
-User message: "{user_message}"
-
-Remember:
-1. ONLY output the JSON object
-2. Keep it brief and warm
-3. Be specific and actionable"""
-
+    ) -> List[Dict[str, str]]:
+        """Chat messages for the turn: the static instructions, then the user's message."""
+        turn = user_message
         if emotional_state.risk_level > 0.7:
-            prompt += """\nCRISIS PROTOCOL ACTIVATED:
-- Express immediate concern for their safety
-- Provide crisis resources (988 Crisis Line, 911)
-- Encourage professional help
-- Keep response focused on immediate safety"""
-            
-        return prompt
+            turn += "\n\n" + CRISIS_PROTOCOL
+        return self.prompt_builder.build(turn)
 
     def create_crisis_response(self) -> str:
         return """I'm very concerned about your safety right now. What you're going through is serious, and you deserve immediate support. While I'm here to listen, it's crucial to connect with professional help who can provide the support you need right now.
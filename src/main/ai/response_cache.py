@@ -0,0 +1,98 @@
+import copy
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+WHITESPACE = re.compile(r"\s+")
+
+class ResponseCache:
+    """LRU cache of LLM responses bounded by entry count, total bytes and age.
+
+    Keys are a hash of the normalized message array plus the sampling
+    parameters, so "Hello" and " hello " share an entry. Callers decide what is
+    cacheable: only turns with a normal safety result should ever be looked up
+    or stored, and ``bypass()`` counts the ones that were not.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 4 * 1024 * 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (expires_at, size, response), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(messages: List[Dict[str, str]], **params) -> str:
+        normalized = [
+            [message.get("role", ""), WHITESPACE.sub(" ", message.get("content", "")).strip().casefold()]
+            for message in messages
+        ]
+        payload = json.dumps([normalized, params], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        # Callers may mutate what they get back; the cached copy stays intact
+        return copy.deepcopy(entry[2])
+
+    def lookup(self, cacheable: bool, messages: List[Dict[str, str]], **params) -> Tuple[Optional[str], Optional[Any]]:
+        """Return the turn's key and cached response, or (None, None) when it bypasses the cache."""
+        if not cacheable:
+            self.bypass()
+            return None, None
+        key = self.key(messages, **params)
+        return key, self.get(key)
+
+    def put(self, key: str, response: Any):
+        size = len(json.dumps(response).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, copy.deepcopy(response))
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def bypass(self):
+        self.bypasses += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "bypasses": self.bypasses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
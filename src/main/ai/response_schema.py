@@ -0,0 +1,141 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict
+from pydantic import BaseModel, ConfigDict
+
+logger = logging.getLogger(__name__)
+
+# Order in which the fields are displayed
+DISPLAY_FIELDS = ("reflection", "validation", "support", "question", "safety_note")
+
+class TherapeuticResponse(BaseModel):
+    """The five-field response structure requested from the model."""
+    model_config = ConfigDict(extra='forbid')
+
+    reflection: str
+    validation: str
+    support: str
+    question: str
+    safety_note: str = ""
+
+def build_response_format() -> Dict:
+    """OpenAI-compatible ``response_format`` constraining generation to TherapeuticResponse."""
+    schema = TherapeuticResponse.model_json_schema()
+    # Strict structured output requires every property to be listed as required
+    schema["required"] = list(schema["properties"])
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "therapeutic_response",
+            "strict": True,
+            "schema": schema
+        }
+    }
+
+RESPONSE_FORMAT = build_response_format()
+
+@dataclass
+class ResponseParseStats:
+    """Counts how often model output needed repair and how long the repair took."""
+    responses: int = 0
+    parsed: int = 0
+    parse_failures: int = 0
+    repaired: int = 0
+    fallbacks: int = 0
+    repair_seconds: float = 0.0
+
+    @property
+    def failure_rate(self) -> float:
+        return self.parse_failures / self.responses if self.responses else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "responses": self.responses,
+            "parsed": self.parsed,
+            "parse_failures": self.parse_failures,
+            "repaired": self.repaired,
+            "fallbacks": self.fallbacks,
+            "failure_rate": round(self.failure_rate, 3),
+            "repair_ms": round(self.repair_seconds * 1000, 2)
+        }
+
+def format_response_for_display(response_dict: Dict) -> str:
+    """Convert response dictionary to natural language"""
+    try:
+        if not isinstance(response_dict, dict):
+            return str(response_dict)
+
+        parts = []
+
+        # Build response naturally
+        if response_dict.get("reflection"):
+            parts.append(response_dict["reflection"].strip())
+
+        if response_dict.get("validation"):
+            validation = response_dict["validation"].strip()
+            if not any(validation.lower().startswith(word) for word in ['and', 'also', 'additionally']):
+                parts.append(validation)
+
+        if response_dict.get("support"):
+            support = response_dict["support"].strip()
+            if not any(support.lower().startswith(word) for word in ['and', 'also', 'additionally']):
+                parts.append(support)
+
+        if response_dict.get("question"):
+            question = response_dict["question"].strip()
+            if not any(question.lower().startswith(word) for word in ['and', 'also', 'additionally']):
+                parts.append(question)
+
+        if response_dict.get("safety_note"):
+            safety = response_dict["safety_note"].strip()
+            if safety:
+                parts.append(f"\nIMPORTANT: {safety}")
+
+        # Join parts with proper spacing and punctuation
+        response = '. '.join(filter(None, parts))
+        response = response.replace('..', '.')  # Remove double periods
+        response = re.sub(r'\s+', ' ', response).strip()  # Clean up whitespace
+
+        # Ensure proper sentence capitalization
+        sentences = response.split('. ')
+        sentences = [s.strip().capitalize() for s in sentences if s.strip()]
+        response = '. '.join(sentences)
+
+        return response
+
+    except Exception as e:
+        logger.error(f"Error formatting response: {e}")
+        return "I'm here to listen and support you. Would you like to share more?"
+
+class DisplayStream:
+    """Turns fields completed while streaming into display text.
+
+    A field is shown once every field before it in DISPLAY_FIELDS has arrived,
+    and each call returns only the text not shown yet. The pieces therefore
+    join to exactly format_response_for_display() of the whole response,
+    separators included.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.shown = ""
+
+    def add(self, field: str, value: str) -> str:
+        self.fields[field] = value
+        ready = {}
+        for name in DISPLAY_FIELDS:
+            if name not in self.fields:
+                break
+            ready[name] = self.fields[name]
+        return self._advance(format_response_for_display(ready))
+
+    def finish(self, response: Dict) -> str:
+        """The rest of the final rendering of ``response``."""
+        return self._advance(format_response_for_display(response))
+
+    def _advance(self, text: str) -> str:
+        if not text.startswith(self.shown):
+            return ""
+        new, self.shown = text[len(self.shown):], text
+        return new
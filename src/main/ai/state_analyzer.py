@@ -1,7 +1,12 @@
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Set, Tuple
 import re
 from dataclasses import dataclass
 from datetime import datetime
+try:
+    from .pattern_index import PatternIndex
+except ImportError:
+    # Imported as a top-level module by the scripts and tests in ai/
+    from pattern_index import PatternIndex
 
 @dataclass
 class EmotionalState:
@@ -9,9 +14,67 @@ class EmotionalState:
     intensity: float  # 0-1 scale
     risk_level: float  # 0-1 scale
     timestamp: datetime
+    # A crisis or immediate-risk pattern matched, whatever the emotion scores say
+    risk_patterns_matched: bool = False
+
+class EmotionScan(NamedTuple):
+    emotion_scores: Dict[str, int]
+    modifier_hits: Set[int]
+    immediate_risk: bool
+
+class EmotionScoringEngine:
+    """Scores emotions, intensity modifiers and immediate risk in one scan of a message.
+
+    All patterns are compiled once into a single alternation. Counts follow
+    ``re.findall`` per pattern and modifier/risk hits follow ``re.search``.
+    """
+
+    def __init__(
+        self,
+        emotion_patterns: Dict[str, List[str]],
+        intensity_modifiers: List[Tuple[str, float]],
+        immediate_risk_patterns: List[str]
+    ):
+        self.emotions = list(emotion_patterns)
+        # (kind, key) where key is the emotion name or modifier index
+        self._entries = (
+            [('emotion', emotion) for emotion, patterns in emotion_patterns.items() for _ in patterns]
+            + [('modifier', index) for index in range(len(intensity_modifiers))]
+            + [('risk', None) for _ in immediate_risk_patterns]
+        )
+        self._index = PatternIndex(
+            [pattern for patterns in emotion_patterns.values() for pattern in patterns]
+            + [pattern for pattern, _ in intensity_modifiers]
+            + list(immediate_risk_patterns)
+        )
+
+    def scan(self, message: str) -> EmotionScan:
+        emotion_scores = dict.fromkeys(self.emotions, 0)
+        modifier_hits = set()
+        immediate_risk = False
+        # findall does not count overlapping matches of the same pattern
+        last_end = [0] * len(self._entries)
+
+        for index, match in self._index.iter_matches(message):
+            kind, key = self._entries[index]
+            if kind == 'emotion':
+                if match.start() < last_end[index]:
+                    continue
+                emotion_scores[key] += 1
+                last_end[index] = max(match.end(), match.start() + 1)
+            elif kind == 'modifier':
+                modifier_hits.add(key)
+            else:
+                immediate_risk = True
+
+        return EmotionScan(emotion_scores, modifier_hits, immediate_risk)
 
 class StateAnalyzer:
-    def __init__(self):
+    def __init__(self, classifier=None):
+        """Pass a fitted ``HashedEmotionClassifier`` to pick the primary emotion with
+        it instead of the regex scores. Intensity and risk still come from the
+        regex scan, and crisis patterns always take precedence."""
+        self.classifier = classifier
         self.emotion_patterns = {
             'neutral': [
                 r'hello', r'hi', r'hey', r'how are you',
@@ -57,18 +120,51 @@ class StateAnalyzer:
             (r'sometimes|occasionally|a bit|slightly', -0.1),
             (r'maybe|perhaps|not sure', -0.2)
         ]
+
+        self.immediate_risk_patterns = [
+            r'right now', r'tonight', r'plan to',
+            r'going to', r'decided to'
+        ]
+
+        self.engine = EmotionScoringEngine(
+            self.emotion_patterns,
+            self.intensity_modifiers,
+            self.immediate_risk_patterns
+        )
         
     def analyze_message(self, message: str) -> EmotionalState:
-        message = message.lower()
-        primary_emotion = self._detect_primary_emotion(message)
-        intensity = self._calculate_intensity(message)
-        risk_level = self._assess_risk(message, primary_emotion, intensity)
+        if self.classifier is not None:
+            return self.analyze_messages([message])[0]
+
+        scan = self.engine.scan(message.lower())
+        primary_emotion = self._primary_emotion_from_scores(scan.emotion_scores)
+        return self._build_state(scan, primary_emotion)
+
+    def analyze_messages(self, messages: List[str]) -> List[EmotionalState]:
+        """Analyze a batch of messages, e.g. a whole chat history.
+
+        With a classifier the emotions of the batch are predicted in one
+        vectorized call."""
+        scans = [self.engine.scan(message.lower()) for message in messages]
+        if self.classifier is None:
+            emotions = [self._primary_emotion_from_scores(scan.emotion_scores) for scan in scans]
+        else:
+            emotions = [
+                'crisis' if scan.emotion_scores['crisis'] else predicted
+                for scan, predicted in zip(scans, self.classifier.predict(messages))
+            ]
+        return [self._build_state(scan, emotion) for scan, emotion in zip(scans, emotions)]
+
+    def _build_state(self, scan: EmotionScan, primary_emotion: str) -> EmotionalState:
+        intensity = self._intensity_from_modifiers(primary_emotion, scan.modifier_hits)
+        risk_level = self._combine_risk(primary_emotion, intensity, scan.immediate_risk)
         
         return EmotionalState(
             primary_emotion=primary_emotion,
             intensity=intensity,
             risk_level=risk_level,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            risk_patterns_matched=bool(scan.emotion_scores['crisis']) or scan.immediate_risk
         )
     
     def _detect_primary_emotion(self, message: str) -> str:
@@ -78,24 +174,38 @@ class StateAnalyzer:
             score = sum(len(re.findall(pattern, message)) for pattern in patterns)
             emotion_scores[emotion] = score
             
+        return self._primary_emotion_from_scores(emotion_scores)
+
+    def _primary_emotion_from_scores(self, emotion_scores: Dict[str, int]) -> str:
         # Default to neutral if no strong emotions detected
         max_emotion = max(emotion_scores.items(), key=lambda x: x[1])
         return max_emotion[0] if max_emotion[1] > 0 else 'neutral'
     
     def _calculate_intensity(self, message: str) -> float:
+        modifier_hits = {
+            index for index, (pattern, _) in enumerate(self.intensity_modifiers)
+            if re.search(pattern, message)
+        }
+        return self._intensity_from_modifiers(self._detect_primary_emotion(message), modifier_hits)
+
+    def _intensity_from_modifiers(self, emotion: str, modifier_hits: Set[int]) -> float:
         # For neutral messages, return low intensity
-        if self._detect_primary_emotion(message) == 'neutral':
+        if emotion == 'neutral':
             return 0.1
             
         base_intensity = 0.5
         
-        for pattern, modifier in self.intensity_modifiers:
-            if re.search(pattern, message):
+        for index, (_, modifier) in enumerate(self.intensity_modifiers):
+            if index in modifier_hits:
                 base_intensity = min(1.0, max(0.0, base_intensity + modifier))
                 
         return base_intensity
     
     def _assess_risk(self, message: str, emotion: str, intensity: float) -> float:
+        immediate_risk = any(re.search(pattern, message) for pattern in self.immediate_risk_patterns)
+        return self._combine_risk(emotion, intensity, immediate_risk)
+
+    def _combine_risk(self, emotion: str, intensity: float, immediate_risk: bool) -> float:
         risk_level = 0.0
         
         # Base risk on emotion type
@@ -110,12 +220,7 @@ class StateAnalyzer:
         risk_level = min(1.0, risk_level + (intensity * 0.2))
         
         # Check for immediate risk patterns
-        immediate_risk_patterns = [
-            r'right now', r'tonight', r'plan to',
-            r'going to', r'decided to'
-        ]
-        
-        if any(re.search(pattern, message) for pattern in immediate_risk_patterns):
+        if immediate_risk:
             risk_level = min(1.0, risk_level + 0.3)
             
         return risk_level
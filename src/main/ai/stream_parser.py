@@ -0,0 +1,69 @@
+import json
+from typing import List, Optional, Sequence, Tuple
+
+RESPONSE_FIELDS = ("reflection", "validation", "support", "question", "safety_note")
+
+class IncrementalJSONFieldParser:
+    """Extracts top-level string fields from a JSON object while it is still streaming.
+
+    ``feed`` accepts arbitrary chunks of model output and returns the
+    ``(field, value)`` pairs whose string value closed within that chunk. Text
+    around the object (e.g. code fences) is ignored.
+    """
+
+    def __init__(self, fields: Sequence[str] = RESPONSE_FIELDS):
+        self.fields = set(fields)
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_chars: List[str] = []
+        self._expecting_key = False
+        self._current_key: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.text += chunk
+        completed = []
+        for char in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    field = self._close_string()
+                    if field:
+                        completed.append(field)
+                    continue
+                self._string_chars.append(char)
+            elif char == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif char in '{[':
+                self._depth += 1
+                self._expecting_key = char == '{' and self._depth == 1
+            elif char in '}]':
+                self._depth = max(0, self._depth - 1)
+            elif char == ',' and self._depth == 1:
+                self._expecting_key = True
+                self._current_key = None
+            elif char == ':' and self._depth == 1:
+                self._expecting_key = False
+        return completed
+
+    def _close_string(self) -> Optional[Tuple[str, str]]:
+        if self._depth != 1:
+            return None
+        try:
+            value = json.loads('"' + ''.join(self._string_chars) + '"')
+        except json.JSONDecodeError:
+            value = ''.join(self._string_chars)
+
+        if self._expecting_key:
+            self._current_key = value
+            return None
+        key, self._current_key = self._current_key, None
+        if key in self.fields:
+            return key, value
+        return None
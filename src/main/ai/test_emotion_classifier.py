@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from emotion_classifier import HashedEmotionClassifier
+from state_analyzer import StateAnalyzer, EmotionalState
+
+EXAMPLES = [
+    ("I feel so anxious and worried about tomorrow", "anxiety"),
+    ("my heart is racing and I can't stop panicking", "anxiety"),
+    ("nervous about the interview, full of fear", "anxiety"),
+    ("I feel empty and hopeless every day", "depression"),
+    ("so sad and lonely, nothing matters", "depression"),
+    ("exhausted and worthless, I can't get out of bed", "depression"),
+    ("hi there, how are you doing", "neutral"),
+    ("good morning, just checking in", "neutral"),
+    ("hello, nice to talk again", "neutral"),
+]
+
+@pytest.fixture
+def classifier():
+    messages, labels = zip(*EXAMPLES)
+    return HashedEmotionClassifier(labels=["neutral", "anxiety", "depression"], n_features=2 ** 10).fit(messages, labels)
+
+def test_fits_training_examples(classifier):
+    messages, labels = zip(*EXAMPLES)
+    assert classifier.predict(messages) == list(labels)
+
+def test_batch_scores_match_dense_features(classifier):
+    messages = ["worried and sad", "", "hello hello"]
+    dense = classifier.transform(messages) @ classifier.weights
+    assert np.allclose(classifier.decision_function(messages), dense, atol=1e-5)
+
+def test_sparse_fit_matches_dense_gradient_descent():
+    messages, labels = zip(*EXAMPLES)
+    classifier = HashedEmotionClassifier(labels=["neutral", "anxiety", "depression"], n_features=2 ** 8)
+    classifier.fit(messages, labels, epochs=5)
+
+    features = classifier.transform(messages)
+    targets = np.eye(3, dtype=np.float32)[[classifier.labels.index(label) for label in labels]]
+    weights = np.zeros_like(classifier.weights)
+    for _ in range(5):
+        probabilities = HashedEmotionClassifier._softmax(features @ weights)
+        weights -= 0.5 * (features.T @ (probabilities - targets) / len(messages) + 1e-4 * weights)
+    assert np.allclose(classifier.weights, weights, atol=1e-5)
+
+def test_save_and_load_memory_mapped(classifier, tmp_path):
+    path = tmp_path / "emotion_weights.npy"
+    classifier.save(path)
+    loaded = HashedEmotionClassifier.load(path)
+    assert isinstance(loaded.weights, np.memmap)
+    messages = [message for message, _ in EXAMPLES]
+    assert loaded.predict(messages) == classifier.predict(messages)
+
+def test_state_analyzer_uses_classifier(classifier):
+    analyzer = StateAnalyzer(classifier=classifier)
+    states = analyzer.analyze_messages(["my heart is racing, I'm really nervous", "I want to kill myself"])
+    assert all(isinstance(state, EmotionalState) for state in states)
+    assert states[0].primary_emotion == "anxiety"
+    assert states[0].intensity == 0.8
+    # Crisis patterns take precedence over the classifier
+    assert states[1].primary_emotion == "crisis"
+    assert analyzer.analyze_message("hi there").primary_emotion == "neutral"
@@ -92,4 +92,23 @@ async def test_test_connection_failure():
         mock_post.return_value.__aenter__.return_value.status = 500
         
         is_connected = await client.test_connection()
-        assert is_connected is False 
\ No newline at end of file
+        assert is_connected is False 
+
+@pytest.mark.asyncio
+async def test_session_reused_across_requests():
+    async with LLMClient() as client:
+        session = await client._get_session()
+        
+        with patch("aiohttp.ClientSession.post") as mock_post:
+            mock_context = MagicMock()
+            mock_context.status = 200
+            async def mock_json():
+                return {"choices": [{"message": {"content": "Test"}}]}
+            mock_context.json = mock_json
+            mock_post.return_value.__aenter__.return_value = mock_context
+            
+            await client.generate_response("First message")
+            await client.generate_response("Second message")
+        
+        assert await client._get_session() is session
+    assert client._session is None
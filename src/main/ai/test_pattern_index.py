@@ -0,0 +1,27 @@
+import re
+import pytest
+from pattern_index import PatternIndex, literal_first_char
+
+@pytest.mark.parametrize("pattern, first", [
+    ("suicide", "s"),
+    (r"self[- ]harm", "s"),
+    (r"s?elf harm", None),
+    (r"a*b", None),
+    (r"a{0,2}b", None),
+    (r"very|really", None),
+    (r"\bsad", None),
+])
+def test_literal_first_char(pattern, first):
+    assert literal_first_char(pattern) == first
+
+def test_reports_every_pattern_at_every_offset():
+    patterns = ["harm myself", r"self[- ]harm", r"s?elf", "a*rm"]
+    text = "i could self harm myself"
+    found = [(patterns[index], match.start()) for index, match in PatternIndex(patterns).iter_matches(text)]
+    expected = sorted(
+        ((pattern, match.start()) for pattern in patterns
+         for start in range(len(text) + 1)
+         for match in [re.compile(pattern).match(text, start)] if match),
+        key=lambda hit: (hit[1], patterns.index(hit[0]))
+    )
+    assert found == expected
@@ -0,0 +1,40 @@
+import response_cache
+from response_cache import ResponseCache
+
+def test_key_normalizes_messages_and_includes_params():
+    key = ResponseCache.key([{"role": "user", "content": "Hello"}], temperature=0.5)
+    assert ResponseCache.key([{"role": "user", "content": "  hello\n"}], temperature=0.5) == key
+    assert ResponseCache.key([{"role": "user", "content": "Hello"}], temperature=0.7) != key
+    assert ResponseCache.key([{"role": "system", "content": "Hello"}], temperature=0.5) != key
+
+def test_bounded_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"message": name})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"message": "c"}
+    assert cache.stats()["evictions"] == 1
+
+    cache = ResponseCache(max_bytes=40)
+    cache.put("a", {"message": "x" * 10})
+    cache.put("b", {"message": "y" * 10})
+    assert cache.get("a") is None
+    assert cache.bytes <= 40
+    cache.put("huge", {"message": "z" * 100})
+    assert cache.get("huge") is None
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=10)
+    cache.put("a", {"message": "hi"})
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+def test_cached_copy_is_not_mutated_by_callers():
+    cache = ResponseCache()
+    cache.put("a", {"message": "hi"})
+    cache.get("a")["message"] = "changed"
+    assert cache.get("a") == {"message": "hi"}
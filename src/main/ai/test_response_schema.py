@@ -0,0 +1,57 @@
+import json
+import pytest
+from pydantic import ValidationError
+from response_schema import (
+    TherapeuticResponse, ResponseParseStats, RESPONSE_FORMAT, DisplayStream, format_response_for_display
+)
+from stream_parser import IncrementalJSONFieldParser
+
+def test_response_format_requires_all_fields():
+    schema = RESPONSE_FORMAT["json_schema"]["schema"]
+    assert RESPONSE_FORMAT["type"] == "json_schema"
+    assert set(schema["required"]) == set(TherapeuticResponse.model_fields)
+    assert schema["additionalProperties"] is False
+
+def test_validates_in_one_parse():
+    content = json.dumps({
+        "reflection": "I hear you",
+        "validation": "That makes sense",
+        "support": "Let's breathe together",
+        "question": "What helps?",
+        "safety_note": ""
+    })
+    assert TherapeuticResponse.model_validate_json(content).support == "Let's breathe together"
+    with pytest.raises(ValidationError):
+        TherapeuticResponse.model_validate_json('{"reflection": "I hear you"}')
+
+def test_parse_stats_failure_rate():
+    stats = ResponseParseStats(responses=4, parsed=3, parse_failures=1, fallbacks=1)
+    assert stats.failure_rate == 0.25
+    assert stats.as_dict()["fallbacks"] == 1
+
+@pytest.mark.parametrize("response", [
+    {
+        "reflection": "I hear that you are feeling anxious",
+        "validation": "It is normal to feel this way",
+        "support": "Let us try a breathing exercise.",
+        "question": "What usually helps you?",
+        "safety_note": ""
+    },
+    {
+        "question": "How did you sleep?",
+        "reflection": "You sound exhausted",
+        "support": "Also, rest matters",
+        "validation": "That is a lot to carry",
+        "safety_note": "Call 988 if you feel unsafe"
+    },
+])
+def test_streamed_rendering_matches_full_rendering(response):
+    content = json.dumps(response)
+    parser = IncrementalJSONFieldParser()
+    display = DisplayStream()
+    parts = []
+    for start in range(0, len(content), 7):
+        for field, value in parser.feed(content[start:start + 7]):
+            parts.append(display.add(field, value))
+    parts.append(display.finish(response))
+    assert "".join(parts) == format_response_for_display(response)
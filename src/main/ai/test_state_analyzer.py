@@ -0,0 +1,43 @@
+import random
+import pytest
+from state_analyzer import StateAnalyzer, EmotionScoringEngine
+from benchmark_state_analyzer import SAMPLE_MESSAGES, legacy_analyze
+
+@pytest.fixture
+def analyzer():
+    return StateAnalyzer()
+
+@pytest.mark.parametrize("message", SAMPLE_MESSAGES)
+def test_engine_matches_legacy_scans(analyzer, message):
+    state = analyzer.analyze_message(message)
+    assert (state.primary_emotion, state.intensity, state.risk_level) == legacy_analyze(analyzer, message)
+
+def test_engine_matches_legacy_on_generated_messages(analyzer):
+    rng = random.Random(7)
+    vocabulary = [
+        pattern.replace('\\', '')
+        for patterns in analyzer.emotion_patterns.values() for pattern in patterns
+    ] + ['very', 'a bit', 'maybe', 'often', 'tonight', 'going to', 'the', 'and', 'this', 'missing']
+    for _ in range(500):
+        message = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 12)))
+        state = analyzer.analyze_message(message)
+        assert (state.primary_emotion, state.intensity, state.risk_level) == legacy_analyze(analyzer, message)
+
+def test_scan_counts_like_findall(analyzer):
+    scan = analyzer.engine.scan("sad, so sad and hopeless")
+    assert scan.emotion_scores['depression'] == 3
+    assert scan.modifier_hits == set()
+    assert scan.immediate_risk is False
+
+def test_engine_counts_patterns_with_optional_first_character():
+    engine = EmotionScoringEngine({'anxiety': [r'w?orr(y|ied)']}, [(r'a*bit', -0.1)], [r's?elf harm'])
+    scan = engine.scan("orry, a bit worried about elf harm")
+    assert scan.emotion_scores['anxiety'] == 2
+    assert scan.modifier_hits == {0}
+    assert scan.immediate_risk is True
+
+def test_risk_patterns_matched_flags_crisis_and_immediate_risk(analyzer):
+    assert not analyzer.analyze_message("Hi there, how are you?").risk_patterns_matched
+    assert not analyzer.analyze_message("I feel really anxious about work").risk_patterns_matched
+    assert analyzer.analyze_message("I want to kill myself").risk_patterns_matched
+    assert analyzer.analyze_message("I decided to stop talking to him").risk_patterns_matched
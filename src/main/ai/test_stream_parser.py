@@ -0,0 +1,32 @@
+import json
+from stream_parser import IncrementalJSONFieldParser
+
+RESPONSE = {
+    "reflection": "I hear that you're feeling \"stuck\"",
+    "validation": "It's normal to feel this way",
+    "support": "Let's try a short breathing exercise:\n4 in, 4 out",
+    "question": "What feels heaviest right now?",
+    "safety_note": ""
+}
+
+def feed_all(parser, text, chunk_size):
+    fields = []
+    for start in range(0, len(text), chunk_size):
+        fields.extend(parser.feed(text[start:start + chunk_size]))
+    return fields
+
+def test_fields_emitted_in_order_for_any_chunking():
+    text = json.dumps(RESPONSE, indent=4)
+    for chunk_size in (1, 3, 7, len(text)):
+        assert feed_all(IncrementalJSONFieldParser(), text, chunk_size) == list(RESPONSE.items())
+
+def test_field_emitted_as_soon_as_value_closes():
+    parser = IncrementalJSONFieldParser()
+    assert parser.feed('{"reflection": "I hear you') == []
+    assert parser.feed('", "valid') == [("reflection", "I hear you")]
+
+def test_ignores_surrounding_text_and_nested_values():
+    parser = IncrementalJSONFieldParser()
+    text = 'Sure!\n```json\n{"meta": {"question": "nested"}, "tags": ["support"], "question": "How are you?"}\n```'
+    assert parser.feed(text) == [("question", "How are you?")]
+    assert parser.text == text
@@ -0,0 +1,107 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+from .database import Database
+from .sharded_database import ShardedDatabase
+from .models import UserProfile, ChatMessage, HistorySearchResult
+
+class AsyncDatabase:
+    """Awaitable counterpart of Database for async request handlers.
+
+    Writes run on a single writer thread, matching SQLite's single-writer model.
+    Reads run on a bounded pool of reader threads. Each thread keeps its own
+    Database connection, so slow disk I/O never blocks the event loop.
+
+    A ShardedDatabase has one writer lock per shard, so give it more writer
+    threads (``max_writers``) to commit to several shards at once.
+    """
+
+    def __init__(self, db: Union[Database, ShardedDatabase], max_readers: int = 4, max_writers: int = 1):
+        self.db = db
+        self._writer = ThreadPoolExecutor(max_workers=max_writers, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix="db-reader")
+
+    async def _run(self, executor: ThreadPoolExecutor, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+    async def save_user_profile(self, profile: UserProfile) -> int:
+        return await self._run(self._writer, self.db.save_user_profile, profile)
+
+    async def get_user_profile(self, user_id: int) -> Optional[UserProfile]:
+        return await self._run(self._readers, self.db.get_user_profile, user_id)
+
+    async def delete_user_profile(self, user_id: int) -> bool:
+        return await self._run(self._writer, self.db.delete_user_profile, user_id)
+
+    async def save_chat_message(self, user_id: int, message: ChatMessage):
+        return await self._run(self._writer, self.db.save_chat_message, user_id, message)
+
+    async def save_turn(self, user_id: int, user_message: ChatMessage, assistant_message: ChatMessage):
+        return await self._run(self._writer, self.db.save_turn, user_id, user_message, assistant_message)
+
+    async def get_chat_history(
+        self,
+        user_id: int,
+        limit: int = 10,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> List[ChatMessage]:
+        return await self._run(self._readers, self.db.get_chat_history, user_id, limit, before_id, after_id)
+
+    async def get_chat_history_page(self, user_id: int, after_id: int = 0, limit: int = 500) -> List[ChatMessage]:
+        return await self._run(self._readers, self.db.get_chat_history_page, user_id, after_id, limit)
+
+    async def get_archived_batch(self, user_id: int, after_id: int = 0) -> List[ChatMessage]:
+        return await self._run(self._readers, self.db.get_archived_batch, user_id, after_id)
+
+    async def iter_chat_history(
+        self,
+        user_id: int,
+        batch_size: int = 500,
+        include_archive: bool = False
+    ) -> AsyncIterator[ChatMessage]:
+        """Yield the user's entire history oldest first, fetching one batch at a time.
+
+        Each batch is the next step of the database's own batch iterator, run on
+        a reader thread."""
+        batches = self.db.iter_chat_history_batches(user_id, batch_size, include_archive)
+        try:
+            while True:
+                batch = await self._run(self._readers, next, batches, None)
+                if batch is None:
+                    return
+                for message in batch:
+                    yield message
+        finally:
+            batches.close()
+
+    async def get_mood_statistics(self, user_id: int) -> Dict[str, Any]:
+        return await self._run(self._readers, self.db.get_mood_statistics, user_id)
+
+    async def get_mood_trends(self, user_id: int, granularity: str = "day", since: str = "") -> List[Dict[str, Any]]:
+        return await self._run(self._readers, self.db.get_mood_trends, user_id, granularity, since)
+
+    async def search_history(
+        self,
+        user_id: int,
+        query: str,
+        limit: int = 20,
+        include_archive: bool = False
+    ) -> List[HistorySearchResult]:
+        return await self._run(self._readers, self.db.search_history, user_id, query, limit, include_archive)
+
+    async def compact_history(self, older_than_days: int = 90) -> Dict[str, int]:
+        # Runs off the writer thread; it only holds the write lock one batch at a time
+        return await self._run(None, self.db.compact_history, older_than_days)
+
+    async def close(self):
+        """Finish queued work, then close the underlying Database."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
@@ -0,0 +1,14 @@
+import pytest
+from app.models import UserProfile
+
+@pytest.fixture
+def profile():
+    return UserProfile(
+        name="Test User",
+        age_category="20-40",
+        emotions=["anxiety", "stress"],
+        therapy_status="considering",
+        interaction_style="gentle",
+        stress_level="moderate",
+        goals="Better stress management"
+    )
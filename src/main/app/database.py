@@ -1,22 +1,280 @@
+import re
 import sqlite3
-from typing import List, Optional, Dict, Any
+import threading
+from typing import Iterator, List, Optional, Dict, Any
 from contextlib import contextmanager
 import json
-from .models import UserProfile, ChatMessage
+import zlib
+from .models import UserProfile, ChatMessage, HistorySearchResult
+from .moods import MOOD_WEIGHTS, TREND_GRANULARITIES
+from .write_queue import WriteBehindQueue
+
+# Mood rollups are kept per day, week (starting Monday) and month, plus one
+# 'total' bucket per mood that serves the all-time statistics.
+ROLLUP_GRANULARITIES = '''(
+    SELECT 'day' AS granularity UNION ALL SELECT 'week' UNION ALL SELECT 'month' UNION ALL SELECT 'total'
+)'''
+
+ROLLUP_BUCKET = '''CASE granularity
+    WHEN 'day' THEN date({timestamp})
+    WHEN 'week' THEN date({timestamp}, 'weekday 0', '-6 days')
+    WHEN 'month' THEN date({timestamp}, 'start of month')
+    ELSE ''
+END'''
+
+# Full-text index over chat_history.content, kept in sync by triggers. Also
+# built in memory by Database.search_archive. user_id is indexed as a token, so
+# a search intersects the query terms with the user's own postings instead of
+# matching every user's messages and filtering afterwards.
+CREATE_CHAT_HISTORY_FTS = '''CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+    content, user_id, content='chat_history', content_rowid='id', tokenize='porter unicode61'
+)'''
+
+CREATE_CHAT_HISTORY_FTS_INSERT_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+    INSERT INTO chat_history_fts (rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+END'''
+
+CREATE_CHAT_HISTORY_FTS_DELETE_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+    INSERT INTO chat_history_fts (chat_history_fts, rowid, content, user_id)
+    VALUES ('delete', old.id, old.content, old.user_id);
+END'''
+
+CREATE_CHAT_HISTORY_FTS_UPDATE_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF content, user_id ON chat_history BEGIN
+    INSERT INTO chat_history_fts (chat_history_fts, rowid, content, user_id)
+    VALUES ('delete', old.id, old.content, old.user_id);
+    INSERT INTO chat_history_fts (rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+END'''
+
+# Versioned schema migrations, applied in order. PRAGMA user_version records the
+# last version applied, so each migration runs exactly once per database file.
+# A step is a SQL statement, or a (statement, rows) pair run with executemany.
+MIGRATIONS = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_timestamp ON chat_history (user_id, timestamp)",
+    ]),
+    (2, [
+        CREATE_CHAT_HISTORY_FTS,
+        CREATE_CHAT_HISTORY_FTS_INSERT_TRIGGER,
+        CREATE_CHAT_HISTORY_FTS_DELETE_TRIGGER,
+        CREATE_CHAT_HISTORY_FTS_UPDATE_TRIGGER,
+        "INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')",
+    ]),
+    (3, [
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_id ON chat_history (user_id, id)",
+    ]),
+    (4, [
+        # Mood counts maintained on insert, so trends never aggregate the raw
+        # history. Deleting or archiving messages leaves the rollups untouched.
+        '''CREATE TABLE IF NOT EXISTS mood_weights (
+            mood TEXT PRIMARY KEY,
+            weight REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS mood_rollups (
+            user_id INTEGER NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            intensity_sum REAL NOT NULL,
+            PRIMARY KEY (user_id, granularity, bucket, mood)
+        ) WITHOUT ROWID''',
+        ("INSERT OR REPLACE INTO mood_weights (mood, weight) VALUES (?, ?)", list(MOOD_WEIGHTS.items())),
+        f'''CREATE TRIGGER IF NOT EXISTS mood_rollups_insert AFTER INSERT ON chat_history
+        WHEN new.mood IS NOT NULL BEGIN
+            INSERT INTO mood_rollups (user_id, granularity, bucket, mood, count, intensity_sum)
+            SELECT new.user_id, granularity, {ROLLUP_BUCKET.format(timestamp='new.timestamp')}, new.mood, 1,
+                   COALESCE((SELECT weight FROM mood_weights WHERE mood = new.mood), 0)
+            FROM {ROLLUP_GRANULARITIES} WHERE true
+            ON CONFLICT (user_id, granularity, bucket, mood) DO UPDATE SET
+                count = count + excluded.count,
+                intensity_sum = intensity_sum + excluded.intensity_sum;
+        END''',
+        # Backfill from the history written before the rollups existed
+        f'''INSERT INTO mood_rollups (user_id, granularity, bucket, mood, count, intensity_sum)
+        SELECT user_id, granularity, bucket, mood, COUNT(*), SUM(weight) FROM (
+            SELECT h.user_id, granularity, {ROLLUP_BUCKET.format(timestamp='h.timestamp')} AS bucket,
+                   h.mood, COALESCE(w.weight, 0) AS weight
+            FROM chat_history h
+            CROSS JOIN {ROLLUP_GRANULARITIES}
+            LEFT JOIN mood_weights w ON w.mood = h.mood
+            WHERE h.mood IS NOT NULL
+        )
+        GROUP BY user_id, granularity, bucket, mood''',
+    ]),
+    (5, [
+        # Cold tier: old messages compressed into zlib'd JSON batches, one or more
+        # per user per month. See Database.compact_history.
+        '''CREATE TABLE IF NOT EXISTS chat_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            message_count INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        )''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_archive_user_first_id ON chat_archive (user_id, first_id)",
+    ]),
+]
+
+# History is paged by primary key (keyset pagination): newest first before a
+# cursor, oldest first after one. Neither needs an OFFSET scan.
+CHAT_HISTORY_QUERY = '''
+    SELECT * FROM chat_history 
+    WHERE user_id = ? AND id < ?
+    ORDER BY id DESC 
+    LIMIT ?
+'''
+
+CHAT_HISTORY_AFTER_QUERY = '''
+    SELECT * FROM chat_history 
+    WHERE user_id = ? AND id > ?
+    ORDER BY id ASC 
+    LIMIT ?
+'''
+
+MAX_MESSAGE_ID = 2 ** 63 - 1
+
+ARCHIVE_CANDIDATES_QUERY = '''
+    SELECT DISTINCT user_id, strftime('%Y-%m', timestamp) AS month
+    FROM chat_history
+    WHERE timestamp < ?
+'''
+
+ARCHIVE_BATCH_QUERY = '''
+    SELECT id, role, content, mood, timestamp FROM chat_history
+    WHERE user_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY id
+    LIMIT ?
+'''
+
+ARCHIVED_BATCH_QUERY = '''
+    SELECT payload FROM chat_archive
+    WHERE user_id = ? AND first_id > ?
+    ORDER BY first_id
+    LIMIT 1
+'''
+
+MOOD_STATISTICS_QUERY = '''
+    SELECT mood, count
+    FROM mood_rollups
+    WHERE user_id = ? AND granularity = 'total' AND bucket = ''
+'''
+
+MOOD_TRENDS_QUERY = '''
+    SELECT bucket, mood, count, intensity_sum
+    FROM mood_rollups
+    WHERE user_id = ? AND granularity = ? AND bucket >= ?
+    ORDER BY bucket
+'''
+
+INSERT_CHAT_MESSAGE = '''
+    INSERT INTO chat_history (user_id, role, content, mood)
+    VALUES (?, ?, ?, ?)
+'''
+
+SEARCH_HISTORY_QUERY = '''
+    SELECT chat_history.id, chat_history.role, chat_history.mood, chat_history.timestamp,
+           snippet(chat_history_fts, 0, '[', ']', '...', 12) AS snippet,
+           bm25(chat_history_fts, 1.0, 0.0) AS rank
+    FROM chat_history_fts
+    JOIN chat_history ON chat_history.id = chat_history_fts.rowid
+    WHERE chat_history_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+'''
+
+# Function words dropped from search queries so questions like "when did I last
+# talk about my boss?" rank on their content words
+SEARCH_STOPWORDS = {
+    "a", "about", "am", "an", "and", "are", "at", "be", "did", "do", "does", "for",
+    "how", "i", "in", "is", "it", "last", "me", "my", "of", "on", "or", "talk",
+    "talked", "the", "to", "was", "we", "what", "when", "where", "who", "why", "with", "you"
+}
+
+# Hot queries and the index each one must be served from
+HOT_QUERY_INDEXES = {
+    "get_chat_history": (CHAT_HISTORY_QUERY, (1, MAX_MESSAGE_ID, 10), "idx_chat_history_user_id"),
+    "get_chat_history_page": (CHAT_HISTORY_AFTER_QUERY, (1, 0, 10), "idx_chat_history_user_id"),
+    "get_mood_statistics": (MOOD_STATISTICS_QUERY, (1,), "PRIMARY KEY"),
+    "get_mood_trends": (MOOD_TRENDS_QUERY, (1, "day", "2000-01-01"), "PRIMARY KEY"),
+}
 
 class Database:
-    def __init__(self, db_path: str = "mindful_companion.db"):
+    def __init__(
+        self,
+        db_path: str = "mindful_companion.db",
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 128,
+        write_behind: bool = False
+    ):
         self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        # One persistent connection per thread, tracked so close() can release them all
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_queue: Optional[WriteBehindQueue] = None
         self.init_db()
+        if write_behind:
+            self.start_write_behind()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+            # Only possible on a new file, and must precede the switch to WAL
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL lets readers proceed while a write is in progress
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
 
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
         try:
             yield conn
+        except Exception:
+            # The connection outlives this block, so never leave a transaction open
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def start_write_behind(self, max_batch: int = 256, max_delay: float = 0.05):
+        """Queue chat inserts and group-commit them on a background thread.
+
+        Writes return before they are durable; history reads may lag by up to
+        ``max_delay`` seconds until the batch commits."""
+        if self._write_queue is None:
+            self._write_queue = WriteBehindQueue(self._write_chat_rows, max_batch, max_delay)
+
+    def flush(self):
+        if self._write_queue is not None:
+            self._write_queue.flush()
+
+    def close(self):
+        try:
+            if self._write_queue is not None:
+                write_queue, self._write_queue = self._write_queue, None
+                write_queue.close()
         finally:
-            conn.close()
+            with self._connections_lock:
+                for conn in self._connections:
+                    conn.close()
+            self._connections.clear()
+            self._local = threading.local()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -46,6 +304,46 @@ class Database:
                 )
             ''')
             conn.commit()
+            self._migrate(conn)
+
+    def _migrate(self, conn: sqlite3.Connection):
+        for version, statements in MIGRATIONS:
+            # IMMEDIATE takes the write lock, so concurrent starts apply each migration once
+            conn.execute("BEGIN IMMEDIATE")
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version <= current:
+                conn.rollback()
+                continue
+            for statement in statements:
+                if isinstance(statement, tuple):
+                    conn.executemany(*statement)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+
+    def schema_version(self) -> int:
+        with self.get_connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def explain_query_plan(self, query: str, params: tuple = ()) -> List[str]:
+        with self.get_connection() as conn:
+            return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """Verify with EXPLAIN QUERY PLAN that each hot query is served from its index.
+
+        Raises RuntimeError naming the query whose plan scans the table or sorts."""
+        plans = {}
+        for name, (query, params, index) in HOT_QUERY_INDEXES.items():
+            plan = self.explain_query_plan(query, params)
+            uses_index = any(index in step for step in plan)
+            full_scan = any(step.startswith("SCAN ") for step in plan)
+            sorts = any("TEMP B-TREE" in step for step in plan)
+            if not uses_index or full_scan or sorts:
+                raise RuntimeError(f"{name} is not served by {index}: {plan}")
+            plans[name] = plan
+        return plans
 
     def save_user_profile(self, profile: UserProfile) -> int:
         with self.get_connection() as conn:
@@ -75,37 +373,269 @@ class Database:
                 )
             return None
 
+    def delete_user_profile(self, user_id: int) -> bool:
+        """Remove the user's profile; their chat history is kept."""
+        with self.get_connection() as conn:
+            cursor = conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+
     def save_chat_message(self, user_id: int, message: ChatMessage):
+        self._save_chat_rows([(user_id, message.role, message.content, message.mood)])
+
+    def save_turn(self, user_id: int, user_message: ChatMessage, assistant_message: ChatMessage):
+        """Save both sides of a turn in a single transaction."""
+        self._save_chat_rows([
+            (user_id, message.role, message.content, message.mood)
+            for message in (user_message, assistant_message)
+        ])
+
+    def _save_chat_rows(self, rows: List[tuple]):
+        if self._write_queue is not None:
+            self._write_queue.submit(rows)
+        else:
+            self._write_chat_rows(rows)
+
+    def _write_chat_rows(self, rows: List[tuple]):
         with self.get_connection() as conn:
-            conn.execute('''
-                INSERT INTO chat_history (user_id, role, content, mood)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, message.role, message.content, message.mood))
+            conn.executemany(INSERT_CHAT_MESSAGE, rows)
             conn.commit()
 
-    def get_chat_history(self, user_id: int, limit: int = 10) -> List[ChatMessage]:
+    def get_chat_history(
+        self,
+        user_id: int,
+        limit: int = 10,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> List[ChatMessage]:
+        """Return up to ``limit`` messages, newest first.
+
+        ``before_id`` pages back into older history and ``after_id`` fetches the
+        messages that follow a cursor."""
+        if after_id is not None:
+            return list(reversed(self.get_chat_history_page(user_id, after_id, limit)))
         with self.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT * FROM chat_history 
-                WHERE user_id = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (user_id, limit))
-            rows = cursor.fetchall()
+            cursor = conn.execute(CHAT_HISTORY_QUERY, (user_id, before_id or MAX_MESSAGE_ID, limit))
+            return [self._row_to_message(row) for row in cursor.fetchall()]
+
+    def get_chat_history_page(self, user_id: int, after_id: int = 0, limit: int = 500) -> List[ChatMessage]:
+        """Return up to ``limit`` messages following ``after_id``, oldest first."""
+        with self.get_connection() as conn:
+            cursor = conn.execute(CHAT_HISTORY_AFTER_QUERY, (user_id, after_id, limit))
+            return [self._row_to_message(row) for row in cursor.fetchall()]
+
+    def iter_chat_history(
+        self,
+        user_id: int,
+        batch_size: int = 500,
+        include_archive: bool = False
+    ) -> Iterator[ChatMessage]:
+        """Yield the user's entire history oldest first, holding one batch in memory."""
+        for batch in self.iter_chat_history_batches(user_id, batch_size, include_archive):
+            yield from batch
+
+    def iter_chat_history_batches(
+        self,
+        user_id: int,
+        batch_size: int = 500,
+        include_archive: bool = False
+    ) -> Iterator[List[ChatMessage]]:
+        """Yield the user's entire history oldest first as non-empty batches.
+
+        Archived messages are older than any in the hot table, so with
+        ``include_archive`` their batches come first. Hot messages are paged by
+        primary key after the last one seen."""
+        if include_archive:
+            yield from self._iter_archived_batches(user_id)
+        after_id = 0
+        while True:
+            batch = self.get_chat_history_page(user_id, after_id, batch_size)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            after_id = batch[-1].id
+
+    def _row_to_message(self, row: sqlite3.Row) -> ChatMessage:
+        return ChatMessage(
+            id=row['id'],
+            role=row['role'],
+            content=row['content'],
+            mood=row['mood'],
+            timestamp=row['timestamp']
+        )
+
+    def get_mood_statistics(self, user_id: int) -> Dict[str, Any]:
+        with self.get_connection() as conn:
+            cursor = conn.execute(MOOD_STATISTICS_QUERY, (user_id,))
+            return dict(cursor.fetchall())
+
+    def get_mood_trends(self, user_id: int, granularity: str = "day", since: str = "") -> List[Dict[str, Any]]:
+        """Mood counts and average intensity per bucket from ``since`` (ISO date) on,
+        oldest first, read from the rollups rather than the history."""
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        series: List[Dict[str, Any]] = []
+        with self.get_connection() as conn:
+            cursor = conn.execute(MOOD_TRENDS_QUERY, (user_id, granularity, since))
+            for row in cursor.fetchall():
+                if not series or series[-1]["bucket"] != row['bucket']:
+                    series.append({"bucket": row['bucket'], "count": 0, "intensity_sum": 0.0, "moods": {}})
+                point = series[-1]
+                point["moods"][row['mood']] = row['count']
+                point["count"] += row['count']
+                point["intensity_sum"] += row['intensity_sum']
+        for point in series:
+            point["avg_intensity"] = point.pop("intensity_sum") / point["count"]
+        return series
+
+    def search_history(
+        self,
+        user_id: int,
+        query: str,
+        limit: int = 20,
+        include_archive: bool = False
+    ) -> List[HistorySearchResult]:
+        """Rank the user's messages against a free-text query using the FTS5 index.
+
+        With ``include_archive``, archived matches fill the remaining slots."""
+        match = self._fts_match_expression(user_id, query)
+        if not match:
+            return []
+        with self.get_connection() as conn:
+            cursor = conn.execute(SEARCH_HISTORY_QUERY, (match, limit))
+            results = [
+                HistorySearchResult(
+                    id=row['id'],
+                    role=row['role'],
+                    mood=row['mood'],
+                    timestamp=row['timestamp'],
+                    snippet=row['snippet'],
+                    rank=row['rank']
+                ) for row in cursor.fetchall()
+            ]
+        if include_archive and len(results) < limit:
+            results += self.search_archive(user_id, query, limit - len(results))
+        return results
+
+    def search_archive(self, user_id: int, query: str, limit: int = 20) -> List[HistorySearchResult]:
+        """Search the user's archived messages.
+
+        The archive has no index of its own, so its batches are decompressed into
+        a throwaway in-memory FTS table and ranked with the same query as the hot
+        history. Meant for explicit, on-demand lookups."""
+        match = self._fts_match_expression(user_id, query)
+        if not match:
+            return []
+        scratch = sqlite3.connect(":memory:")
+        scratch.row_factory = sqlite3.Row
+        try:
+            scratch.execute('''
+                CREATE TABLE chat_history (
+                    id INTEGER PRIMARY KEY, user_id INTEGER, role TEXT, content TEXT, mood TEXT, timestamp TEXT
+                )
+            ''')
+            scratch.execute(CREATE_CHAT_HISTORY_FTS)
+            scratch.execute(CREATE_CHAT_HISTORY_FTS_INSERT_TRIGGER)
+            scratch.executemany(
+                "INSERT INTO chat_history VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (message.id, user_id, message.role, message.content, message.mood, message.timestamp)
+                    for message in self.iter_archived_history(user_id)
+                )
+            )
+            cursor = scratch.execute(SEARCH_HISTORY_QUERY, (match, limit))
             return [
-                ChatMessage(
+                HistorySearchResult(
+                    id=row['id'],
                     role=row['role'],
-                    content=row['content'],
-                    mood=row['mood']
-                ) for row in rows
+                    mood=row['mood'],
+                    timestamp=row['timestamp'],
+                    snippet=row['snippet'],
+                    rank=row['rank'],
+                    archived=True
+                ) for row in cursor.fetchall()
             ]
+        finally:
+            scratch.close()
 
-    def get_mood_statistics(self, user_id: int) -> Dict[str, Any]:
+    def compact_history(self, older_than_days: int = 90, batch_size: int = 1000) -> Dict[str, int]:
+        """Move messages older than ``older_than_days`` into the compressed archive.
+
+        Each user-month is archived in batches of up to ``batch_size`` messages,
+        one short transaction per batch, so request traffic is never blocked for
+        long. Freed pages are then returned to the filesystem. Mood rollups keep
+        counting archived messages."""
+        stats = {"archived_messages": 0, "archive_batches": 0, "freed_pages": 0}
         with self.get_connection() as conn:
-            cursor = conn.execute('''
-                SELECT mood, COUNT(*) as count
-                FROM chat_history
-                WHERE user_id = ? AND mood IS NOT NULL
-                GROUP BY mood
-            ''', (user_id,))
-            return dict(cursor.fetchall())
\ No newline at end of file
+            cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{int(older_than_days)} days",)).fetchone()[0]
+            groups = conn.execute(ARCHIVE_CANDIDATES_QUERY, (cutoff,)).fetchall()
+            for user_id, month in groups:
+                month_start = f"{month}-01 00:00:00"
+                month_end = min(cutoff, conn.execute("SELECT datetime(?, '+1 month')", (month_start,)).fetchone()[0])
+                while True:
+                    conn.execute("BEGIN IMMEDIATE")
+                    rows = conn.execute(ARCHIVE_BATCH_QUERY, (user_id, month_start, month_end, batch_size)).fetchall()
+                    if not rows:
+                        conn.rollback()
+                        break
+                    payload = zlib.compress(json.dumps([tuple(row) for row in rows]).encode("utf-8"))
+                    conn.execute(
+                        '''INSERT INTO chat_archive (user_id, month, first_id, last_id, message_count, payload)
+                           VALUES (?, ?, ?, ?, ?, ?)''',
+                        (user_id, month, rows[0]['id'], rows[-1]['id'], len(rows), payload)
+                    )
+                    conn.executemany("DELETE FROM chat_history WHERE id = ?", [(row['id'],) for row in rows])
+                    conn.commit()
+                    stats["archived_messages"] += len(rows)
+                    stats["archive_batches"] += 1
+                    if len(rows) < batch_size:
+                        break
+            stats["freed_pages"] = self._reclaim_free_pages(conn)
+        return stats
+
+    def _reclaim_free_pages(self, conn: sqlite3.Connection) -> int:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Files created before incremental auto-vacuum need one full VACUUM to switch
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return free_pages
+
+    def get_archived_batch(self, user_id: int, after_id: int = 0) -> List[ChatMessage]:
+        """Decompress the user's first archive batch holding messages after ``after_id``."""
+        with self.get_connection() as conn:
+            row = conn.execute(ARCHIVED_BATCH_QUERY, (user_id, after_id)).fetchone()
+        if row is None:
+            return []
+        return [
+            ChatMessage(id=id, role=role, content=content, mood=mood, timestamp=timestamp)
+            for id, role, content, mood, timestamp in json.loads(zlib.decompress(row['payload']))
+        ]
+
+    def iter_archived_history(self, user_id: int) -> Iterator[ChatMessage]:
+        """Yield the user's archived messages oldest first, one batch in memory at a time."""
+        for batch in self._iter_archived_batches(user_id):
+            yield from batch
+
+    def _iter_archived_batches(self, user_id: int) -> Iterator[List[ChatMessage]]:
+        after_id = 0
+        while True:
+            batch = self.get_archived_batch(user_id, after_id)
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
+    @staticmethod
+    def _fts_match_expression(user_id: int, query: str) -> str:
+        # Quote every word so user input can never be parsed as FTS5 syntax. Terms
+        # are OR'd and bm25 ranks messages that match more (and rarer) terms first.
+        # They only match the content column; the user_id token selects the user.
+        terms = re.findall(r"\w+", query.lower())
+        terms = [term for term in terms if term not in SEARCH_STOPWORDS] or terms
+        if not terms:
+            return ""
+        return f'user_id : "{int(user_id)}" AND content : (' + " OR ".join(f'"{term}"' for term in terms) + ")"
@@ -0,0 +1,50 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Dict, Optional, Set
+
+class FollowUpRegistry:
+    """Background generations whose result the client collects later.
+
+    Used when a reply is sent before the LLM is done, e.g. the templated crisis
+    response: the personalized follow-up keeps generating and is fetched by id.
+    At most ``max_entries`` follow-ups are remembered; a pending follow-up keeps
+    running after it is forgotten, it just can no longer be fetched.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._tasks: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+        # Strong references, so forgotten tasks are not garbage collected mid-run
+        self._running: Set[asyncio.Task] = set()
+
+    def start(self, work: Awaitable[str]) -> str:
+        follow_up_id = uuid.uuid4().hex
+        task = asyncio.ensure_future(work)
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        self._tasks[follow_up_id] = task
+        if len(self._tasks) > self.max_entries:
+            self._tasks.popitem(last=False)
+        return follow_up_id
+
+    async def get(self, follow_up_id: str, wait: float = 0.0) -> Optional[Dict]:
+        """Status of a follow-up, waiting up to ``wait`` seconds for it to finish.
+
+        Returns None for an unknown id."""
+        task = self._tasks.get(follow_up_id)
+        if task is None:
+            return None
+        if not task.done() and wait > 0:
+            await asyncio.wait({task}, timeout=wait)
+        if not task.done():
+            return {"status": "pending", "message": None}
+        if task.cancelled() or task.exception() is not None:
+            return {"status": "failed", "message": None}
+        return {"status": "ready", "message": task.result()}
+
+    async def close(self):
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
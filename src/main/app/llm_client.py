@@ -1,6 +1,10 @@
 import requests
-from typing import Dict, Any
+import aiohttp
+import asyncio
+from typing import AsyncIterator, Dict, Any, Optional
+import json
 import logging
+from ai.response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -44,4 +48,139 @@ class LLMClient:
             return {"error": str(e), "status": "request_failed"}
         except Exception as e:
             logger.error(f"Error generating response: {e}")
-            return {"error": str(e), "status": "error"}
\ No newline at end of file
+            return {"error": str(e), "status": "error"}
+
+class AsyncLLMClient:
+    """Non-blocking LLM client that keeps a pooled keep-alive connection to LM Studio.
+
+    Returns the same ``{"message", "usage", "status"}`` result as ``LLMClient`` so it
+    can be awaited from async endpoints without stalling the event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:1234",
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        keepalive_timeout: float = 60.0,
+        response_cache: Optional[ResponseCache] = None
+    ):
+        self.base_url = base_url
+        self.response_cache = response_cache
+        self.headers = {"Content-Type": "application/json"}
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=read_timeout)
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.timeout
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        await self.start()
+        return self._session
+
+    async def test_connection(self) -> bool:
+        """Cheap health probe: the server answers the OpenAI-compatible model list."""
+        try:
+            session = await self._get_session()
+            async with session.get(f"{self.base_url}/v1/models") as response:
+                return response.status == 200
+        except Exception as e:
+            logger.error(f"Connection test failed for {self.base_url}: {e}")
+            return False
+
+    async def stream_response(self, messages: list) -> AsyncIterator[str]:
+        """Yield content deltas as LM Studio streams them.
+
+        Unlike ``generate_response`` errors are raised, since part of the reply may
+        already have been delivered. Closing the generator early closes the
+        upstream response and stops the generation.
+        """
+        payload = {
+            "messages": messages,
+            "temperature": 0.5,
+            "max_tokens": 500,
+            "stream": True,
+        }
+
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}/v1/chat/completions", json=payload) as response:
+            response.raise_for_status()
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def generate_response(self, messages: list, cacheable: bool = False) -> Dict[str, Any]:
+        """Pass ``cacheable`` only for turns with a normal safety result; those may be
+        answered from the response cache."""
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key, cached = self.response_cache.lookup(cacheable, messages, temperature=0.5, max_tokens=500)
+            if cached is not None:
+                return cached
+        try:
+            payload = {
+                "messages": messages,
+                "temperature": 0.5,
+                "max_tokens": 500,
+            }
+
+            session = await self._get_session()
+            async with session.post(f"{self.base_url}/v1/chat/completions", json=payload) as response:
+                response.raise_for_status()
+                result = await response.json()
+
+            if not result.get("choices"):
+                raise ValueError("No choices in response")
+
+            response = {
+                "message": result["choices"][0]["message"]["content"],
+                "usage": result.get("usage", {}),
+                "status": "success"
+            }
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+            return response
+
+        except asyncio.TimeoutError:
+            logger.error("Request timed out")
+            return {"error": "Request timed out", "status": "timeout"}
+        except aiohttp.ClientError as e:
+            logger.error(f"Request failed: {e}")
+            return {"error": str(e), "status": "request_failed"}
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return {"error": str(e), "status": "error"}
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+from .llm_client import AsyncLLMClient
+from ai.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Stops sending requests to a backend after ``failure_threshold`` failures in a row.
+
+    Once ``reset_timeout`` seconds have passed, one trial request is let through
+    (half-open); its success closes the breaker and its failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """Whether ``allow_request()`` would let a request through now."""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return self.state == self.CLOSED
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def abandon_trial(self):
+        # A cancelled trial proves nothing; let the next request try again
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+class Backend:
+    def __init__(self, client: AsyncLLMClient, breaker: CircuitBreaker, latency_samples: int):
+        self.client = client
+        self.breaker = breaker
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.latencies: Deque[float] = deque(maxlen=latency_samples)
+
+    @property
+    def url(self) -> str:
+        return self.client.base_url
+
+    @property
+    def available(self) -> bool:
+        # An open breaker past its reset timeout counts, so it can take its trial request
+        return self.healthy and self.breaker.ready
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LLMRouter:
+    """Spreads requests over several OpenAI-compatible backends.
+
+    A drop-in replacement for AsyncLLMClient. Each request goes to the
+    available backend with the fewest requests in flight. A backend is
+    available while its last health probe passed and its circuit breaker would
+    let a request through. A failed generation is retried once on another backend.
+
+    With ``hedge_percentile`` set (e.g. 0.95), a generation still running after
+    that percentile of recent latencies is duplicated on a second backend and
+    the first successful reply wins; the other request is cancelled.
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        client_factory: Callable[..., AsyncLLMClient] = AsyncLLMClient,
+        probe_interval: float = 10.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        latency_samples: int = 256,
+        response_cache: Optional[ResponseCache] = None,
+        **client_options
+    ):
+        if not base_urls:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = [
+            Backend(
+                client_factory(base_url=url, **client_options),
+                CircuitBreaker(failure_threshold, reset_timeout),
+                latency_samples
+            )
+            for url in base_urls
+        ]
+        # Shared by every backend, so it lives here rather than in the clients
+        self.response_cache = response_cache
+        self.probe_interval = probe_interval
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_samples)
+        self._next = 0
+        self._prober: Optional[asyncio.Task] = None
+
+    async def start(self):
+        for backend in self.backends:
+            await backend.client.start()
+        if self._prober is None and self.probe_interval > 0:
+            self._prober = asyncio.create_task(self._probe_periodically())
+
+    async def close(self):
+        if self._prober is not None:
+            self._prober.cancel()
+            await asyncio.gather(self._prober, return_exceptions=True)
+            self._prober = None
+        for backend in self.backends:
+            await backend.client.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def probe(self):
+        """Run one round of health probes against every backend."""
+        results = await asyncio.gather(*[backend.client.test_connection() for backend in self.backends])
+        for backend, healthy in zip(self.backends, results):
+            if backend.healthy != healthy:
+                logger.warning(f"LLM backend {backend.url} is {'up' if healthy else 'down'}")
+            backend.healthy = healthy
+
+    async def _probe_periodically(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.probe_interval)
+
+    def _pick(self, exclude: Optional[Backend] = None) -> Optional[Backend]:
+        candidates = [backend for backend in self.backends if backend is not exclude and backend.available]
+        if not candidates:
+            return None
+        # Rotate the starting point so ties do not always land on the first backend
+        self._next = (self._next + 1) % len(self.backends)
+        candidates.sort(key=lambda backend: (
+            backend.outstanding, (self.backends.index(backend) - self._next) % len(self.backends)
+        ))
+        for backend in candidates:
+            if backend.breaker.allow_request():
+                return backend
+        return None
+
+    async def _generate_on(self, backend: Backend, messages: list) -> Dict[str, Any]:
+        backend.outstanding += 1
+        backend.requests += 1
+        started = time.perf_counter()
+        try:
+            response = await backend.client.generate_response(messages)
+        except asyncio.CancelledError:
+            backend.breaker.abandon_trial()
+            raise
+        finally:
+            backend.outstanding -= 1
+        if response.get("status") == "success":
+            elapsed = time.perf_counter() - started
+            backend.latencies.append(elapsed)
+            self._latencies.append(elapsed)
+            backend.breaker.record_success()
+        else:
+            backend.failures += 1
+            backend.breaker.record_failure()
+        return response
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile is None or len(self._latencies) < self.hedge_min_samples:
+            return None
+        return percentile(self._latencies, self.hedge_percentile)
+
+    async def generate_response(self, messages: list, cacheable: bool = False) -> Dict[str, Any]:
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key, cached = self.response_cache.lookup(cacheable, messages, temperature=0.5, max_tokens=500)
+            if cached is not None:
+                return cached
+        response = await self._route(messages)
+        if cache_key is not None and response.get("status") == "success":
+            self.response_cache.put(cache_key, response)
+        return response
+
+    async def _route(self, messages: list) -> Dict[str, Any]:
+        primary = self._pick()
+        if primary is None:
+            return {"error": "No LLM backend available", "status": "unavailable"}
+
+        first = asyncio.create_task(self._generate_on(primary, messages))
+        try:
+            delay = self._hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait({first}, timeout=delay)
+                secondary = None if done else self._pick(exclude=primary)
+                if secondary is not None:
+                    self.hedges += 1
+                    return await self._race(first, asyncio.create_task(self._generate_on(secondary, messages)))
+            response = await first
+        finally:
+            first.cancel()
+
+        if response.get("status") != "success":
+            fallback = self._pick(exclude=primary)
+            if fallback is not None:
+                logger.warning(f"Retrying on {fallback.url} after {primary.url} failed: {response.get('error')}")
+                return await self._generate_on(fallback, messages)
+        return response
+
+    async def _race(self, first: asyncio.Task, hedge: asyncio.Task) -> Dict[str, Any]:
+        pending = {first, hedge}
+        response = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response = task.result()
+                    if response.get("status") == "success":
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return response
+            return response
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_response(self, messages: list) -> AsyncIterator[str]:
+        """Stream from the least-loaded backend. Streams are not hedged or retried,
+        since part of the reply may already have been delivered."""
+        backend = self._pick()
+        if backend is None:
+            raise RuntimeError("No LLM backend available")
+        backend.outstanding += 1
+        backend.requests += 1
+        started = time.perf_counter()
+        try:
+            async for delta in backend.client.stream_response(messages):
+                yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            backend.breaker.abandon_trial()
+            raise
+        except Exception:
+            backend.failures += 1
+            backend.breaker.record_failure()
+            raise
+        finally:
+            backend.outstanding -= 1
+        backend.latencies.append(time.perf_counter() - started)
+        backend.breaker.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "backends": [
+                {
+                    "url": backend.url,
+                    "healthy": backend.healthy,
+                    "breaker": backend.breaker.state,
+                    "outstanding": backend.outstanding,
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "p50_ms": round(percentile(backend.latencies, 0.5) * 1000, 1) if backend.latencies else None,
+                    "p95_ms": round(percentile(backend.latencies, 0.95) * 1000, 1) if backend.latencies else None,
+                }
+                for backend in self.backends
+            ],
+        }
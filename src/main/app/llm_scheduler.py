@@ -0,0 +1,128 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+# Lower runs first
+PRIORITY_CRISIS = 0
+PRIORITY_ELEVATED = 1
+PRIORITY_NORMAL = 2
+PRIORITY_BACKGROUND = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_CRISIS: "crisis",
+    PRIORITY_ELEVATED: "elevated",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# SafetyMonitor.analyze_message risk levels
+RISK_LEVEL_PRIORITIES = {
+    "severe": PRIORITY_CRISIS,
+    "high": PRIORITY_CRISIS,
+}
+
+# StateAnalyzer.get_response_type response types
+RESPONSE_TYPE_PRIORITIES = {
+    "crisis_intervention": PRIORITY_CRISIS,
+    "grounding": PRIORITY_ELEVATED,
+    "emotional_support": PRIORITY_ELEVATED,
+}
+
+def priority_for_risk_level(risk_level: str) -> int:
+    return RISK_LEVEL_PRIORITIES.get(risk_level, PRIORITY_NORMAL)
+
+def priority_for_response_type(response_type: str) -> int:
+    return RESPONSE_TYPE_PRIORITIES.get(response_type, PRIORITY_NORMAL)
+
+class QueueFullError(RuntimeError):
+    """Raised when a request arrives while the scheduler's queue is full."""
+
+class LLMScheduler:
+    """Admits at most ``max_concurrency`` LLM generations at a time.
+
+    Requests beyond that wait in a priority queue of at most ``max_queue``
+    entries, so a crisis turn is served before casual chatter that arrived
+    earlier. Requests of equal priority are served in arrival order, and a
+    request that arrives to a full queue fails fast with QueueFullError.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 64, wait_samples: int = 1024):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.rejected = 0
+        self.wait_samples = wait_samples
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._waits: Dict[int, Deque[float]] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        started = time.perf_counter()
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self._record_wait(priority, started)
+            return
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"LLM queue is full ({self.max_queue} waiting)")
+
+        entry = (priority, next(self._order), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, entry)
+        try:
+            await entry[2]
+        except asyncio.CancelledError:
+            if entry[2].done() and not entry[2].cancelled():
+                # The slot was handed over just as the waiter was cancelled
+                self.release()
+            else:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            raise
+        self._record_wait(priority, started)
+
+    def release(self):
+        self.active -= 1
+        while self._queue and self.active < self.max_concurrency:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NORMAL) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _record_wait(self, priority: int, started: float):
+        self._waits.setdefault(priority, deque(maxlen=self.wait_samples)).append(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, active generations and recent wait times (ms) per priority."""
+        waits = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "count": len(ordered),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+                "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 2) if ordered else 0.0,
+                "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            }
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "waits": waits,
+        }
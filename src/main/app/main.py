@@ -1,18 +1,61 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from .models import ChatRequest, ChatResponse, UserProfile, ChatMessage
-from .llm_client import LLMClient
+from .llm_client import AsyncLLMClient
+from .llm_router import LLMRouter
+from ai.response_cache import ResponseCache
 from .prompt_helper import PromptHelper
 from .database import Database
+from .async_database import AsyncDatabase
+from .sharded_database import ShardedDatabase
+from .profile_cache import ProfileContextCache
+from .llm_scheduler import LLMScheduler, QueueFullError, priority_for_risk_level
+import asyncio
 import logging
+import os
 from typing import Optional
-from .session_analyzer import SessionAnalyzer
+from .moods import TREND_GRANULARITIES
+from .session_analyzer import SessionAnalyzer, trend_window_start
+from .turn_context import TurnAnalyzer, TurnContext
+from .follow_ups import FollowUpRegistry
 from datetime import datetime
+from contextlib import asynccontextmanager
+import json
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="MindfulCompanion API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled LLM connection on startup and release it on shutdown
+    await llm_client.start()
+    compaction = None
+    # Set MINDFUL_ARCHIVE_AFTER_DAYS to move older messages into the compressed archive
+    archive_after_days = os.getenv("MINDFUL_ARCHIVE_AFTER_DAYS")
+    if archive_after_days:
+        interval = float(os.getenv("MINDFUL_COMPACT_INTERVAL", "3600"))
+        compaction = asyncio.create_task(compact_periodically(int(archive_after_days), interval))
+    yield
+    if compaction is not None:
+        compaction.cancel()
+    await follow_ups.close()
+    await llm_client.close()
+    # Flushes any queued chat writes before the process exits
+    await adb.close()
+
+async def compact_periodically(older_than_days: int, interval: float):
+    while True:
+        try:
+            stats = await adb.compact_history(older_than_days)
+            if stats["archived_messages"]:
+                logger.info(f"Archived chat history: {stats}")
+        except Exception as e:
+            logger.error(f"Error compacting history: {e}")
+        await asyncio.sleep(interval)
+
+app = FastAPI(title="MindfulCompanion API", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -24,10 +67,60 @@ app.add_middleware(
 )
 
 # Initialize services
-db = Database()
-llm_client = LLMClient()
+def create_database():
+    """Set MINDFUL_WRITE_BEHIND=1 to group-commit chat writes off the response path.
+
+    With write-behind a turn is acknowledged before it is durable. A batch whose
+    commit fails twice is dropped: the turns are lost and the error is logged,
+    then raised from the next flush() or from close() at shutdown.
+
+    Set MINDFUL_SHARDS to a number of shard files, or to "user" for one file
+    per user, to spread users over MINDFUL_SHARD_DIR instead of one database."""
+    write_behind = os.getenv("MINDFUL_WRITE_BEHIND") == "1"
+    shards = os.getenv("MINDFUL_SHARDS")
+    if not shards:
+        return Database(write_behind=write_behind), 1
+    db = ShardedDatabase(
+        directory=os.getenv("MINDFUL_SHARD_DIR", "mindful_companion_shards"),
+        shards=None if shards == "user" else int(shards),
+        write_behind=write_behind
+    )
+    return db, 4
+
+db, db_writers = create_database()
+# Handlers use the async wrapper so disk I/O stays off the event loop
+adb = AsyncDatabase(db, max_writers=db_writers)
+def create_llm_client(response_cache: ResponseCache):
+    """Set MINDFUL_LLM_BACKENDS to a comma-separated list of server URLs to route
+    over several model servers; MINDFUL_LLM_HEDGE_PERCENTILE (e.g. 0.95) enables
+    hedged requests."""
+    backends = [url.strip() for url in os.getenv("MINDFUL_LLM_BACKENDS", "").split(",") if url.strip()]
+    if not backends:
+        return AsyncLLMClient(response_cache=response_cache)
+    hedge_percentile = os.getenv("MINDFUL_LLM_HEDGE_PERCENTILE")
+    return LLMRouter(
+        backends,
+        hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+        response_cache=response_cache
+    )
+
+# Replies to repeated openers ("hi", "how are you"); turns with a non-normal
+# safety result never read from or write to it
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("MINDFUL_RESPONSE_CACHE_ENTRIES", "512")),
+    ttl=float(os.getenv("MINDFUL_RESPONSE_CACHE_TTL", "600"))
+)
+llm_client = create_llm_client(response_cache)
 prompt_helper = PromptHelper()
 session_analyzer = SessionAnalyzer()
+turn_analyzer = TurnAnalyzer(prompt_helper.safety_monitor)
+profile_cache = ProfileContextCache(adb, prompt_helper)
+follow_ups = FollowUpRegistry()
+# Generations LM Studio runs at once; crisis turns jump the queue for the rest
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.getenv("MINDFUL_LLM_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("MINDFUL_LLM_QUEUE", "64"))
+)
 
 # Dependency to get current user (in a real app, this would use authentication)
 async def get_current_user_id() -> int:
@@ -36,66 +129,276 @@ async def get_current_user_id() -> int:
 @app.post("/profile")
 async def create_profile(profile: UserProfile, user_id: int = Depends(get_current_user_id)):
     try:
-        user_id = db.save_user_profile(profile)
+        user_id = await profile_cache.save_user_profile(profile)
         return {"user_id": user_id, "message": "Profile created successfully"}
     except Exception as e:
         logger.error(f"Error creating profile: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def build_messages(user_id: int, turn: TurnContext) -> list:
+    if turn.is_crisis:
+        # The crisis prompt uses neither the profile nor the history
+        return prompt_helper.format_conversation(turn.message, turn.mood, [], None, safety_check=turn.safety_check)
+    # Get user profile (cached with its system prompt) and chat history
+    context, history = await asyncio.gather(
+        profile_cache.get(user_id),
+        adb.get_chat_history(user_id, limit=prompt_helper.prompt_builder.max_history)
+    )
+    
+    # Format conversation with context; history comes back newest first
+    return prompt_helper.format_conversation(
+        message=turn.message,
+        mood=turn.mood,
+        history=history[::-1],
+        user_profile=context.profile,
+        safety_check=turn.safety_check,
+        system_prompt=context.system_prompt,
+        conversation=user_id
+    )
+
+async def generate_crisis_follow_up(user_id: int, turn: TurnContext) -> str:
+    """Personalized reply sent after the templated crisis response, saved as its own message."""
+    messages = await build_messages(user_id, turn)
+    async with llm_scheduler.slot(priority_for_risk_level(turn.risk_level)):
+        response = await llm_client.generate_response(messages)
+    if response.get("status") != "success":
+        raise RuntimeError(f"Crisis follow-up failed: {response.get('error')}")
+    await adb.save_chat_message(user_id, ChatMessage(role="assistant", content=response["message"]))
+    return response["message"]
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(
     request: ChatRequest,
     user_id: int = Depends(get_current_user_id)
 ):
     try:
-        # Get user profile and chat history
-        profile = db.get_user_profile(user_id)
-        history = db.get_chat_history(user_id)
+        # Analyze the turn once; every step below reuses the result
+        turn = turn_analyzer.analyze(request.message, request.mood)
         
-        # Format conversation with context
-        messages = prompt_helper.format_conversation(
-            message=request.message,
-            mood=request.mood,
-            history=history,
-            user_profile=profile
-        )
+        if turn.is_crisis:
+            # Log crisis detection for monitoring
+            logger.warning(f"Crisis detected - User ID: {user_id}, Risk Level: {turn.risk_level}")
+            # Answer with the crisis resources now instead of waiting on the model
+            await adb.save_turn(
+                user_id,
+                ChatMessage(role="user", content=turn.message, mood=turn.mood),
+                ChatMessage(role="assistant", content=turn.crisis_message)
+            )
+            follow_up_id = None
+            if request.crisis_follow_up:
+                follow_up_id = follow_ups.start(generate_crisis_follow_up(user_id, turn))
+            return ChatResponse(
+                message=turn.crisis_message,
+                emotional_state=turn.risk_level,
+                crisis_resources=turn.crisis_resources,
+                follow_up_id=follow_up_id
+            )
+        
+        messages = await build_messages(user_id, turn)
         
         # Generate response
-        response = llm_client.generate_response(messages)
+        async with llm_scheduler.slot(priority_for_risk_level(turn.risk_level)):
+            response = await llm_client.generate_response(messages, cacheable=turn.risk_level == "normal")
+        if response.get("status") != "success":
+            logger.error(f"LLM request failed - User ID: {user_id}: {response.get('error')}")
+            # Keep the user's message so the next turn still sees it in the history
+            await adb.save_chat_message(user_id, ChatMessage(role="user", content=turn.message, mood=turn.mood))
+            raise HTTPException(status_code=503, detail=response.get("error") or "LLM request failed")
         
         # Save the interaction
-        db.save_chat_message(user_id, ChatMessage(
-            role="user",
-            content=request.message,
-            mood=request.mood
-        ))
-        
-        db.save_chat_message(user_id, ChatMessage(
-            role="assistant",
-            content=response["message"]
-        ))
+        await adb.save_turn(
+            user_id,
+            ChatMessage(role="user", content=turn.message, mood=turn.mood),
+            ChatMessage(role="assistant", content=response["message"])
+        )
         
         return ChatResponse(
             message=response["message"],
-            emotional_state="supportive"  # This could be enhanced with actual emotion detection
+            emotional_state=turn.risk_level,
+            crisis_resources=turn.crisis_resources
         )
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        logger.warning(f"Rejected chat turn - User ID: {user_id}: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/chat/follow-up/{follow_up_id}")
+async def get_follow_up(follow_up_id: str, wait: float = 0.0):
+    """Poll for a crisis follow-up, optionally waiting up to ``wait`` seconds."""
+    result = await follow_ups.get(follow_up_id, min(max(wait, 0.0), 30.0))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown follow-up")
+    return result
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    user_id: int = Depends(get_current_user_id)
+):
+    """Relay the reply as server-sent events: one ``data`` event per delta, then a
+    ``done`` event carrying the full message and the time to first token.
+
+    On crisis turns a ``crisis`` event carries the templated crisis response
+    before the model is called; the deltas that follow are the personalized
+    follow-up, unless the request opts out of it.
+
+    If the model output turns unsafe, generation is aborted and a ``replace``
+    event carries the crisis message that supersedes the partial reply."""
+    try:
+        turn = turn_analyzer.analyze(request.message, request.mood)
+        
+        if turn.is_crisis:
+            logger.warning(f"Crisis detected - User ID: {user_id}, Risk Level: {turn.risk_level}")
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        started = time.perf_counter()
+        ttft_ms = None
+        parts = []
+        crisis_resources = turn.crisis_resources
+        if turn.is_crisis:
+            # The crisis resources go out before the model is even queued
+            yield format_sse({"message": turn.crisis_message, "crisis_resources": crisis_resources}, event="crisis")
+            if not request.crisis_follow_up:
+                await adb.save_turn(
+                    user_id,
+                    ChatMessage(role="user", content=turn.message, mood=turn.mood),
+                    ChatMessage(role="assistant", content=turn.crisis_message)
+                )
+                yield format_sse({
+                    "message": turn.crisis_message,
+                    "emotional_state": turn.risk_level,
+                    "crisis_resources": crisis_resources,
+                    "ttft_ms": None,
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1)
+                }, event="done")
+                return
+        try:
+            messages = await build_messages(user_id, turn)
+        except Exception as e:
+            logger.error(f"Error building chat stream prompt: {e}")
+            yield format_sse({"error": str(e)}, event="error")
+            return
+        # Screen the model's own output as it arrives
+        scanner = prompt_helper.safety_monitor.stream_scanner()
+        unsafe = None
+        try:
+            await llm_scheduler.acquire(priority_for_risk_level(turn.risk_level))
+        except QueueFullError as e:
+            yield format_sse({"error": str(e)}, event="error")
+            return
+        stream = llm_client.stream_response(messages)
+        try:
+            async for delta in stream:
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                unsafe = scanner.feed(delta)
+                if unsafe:
+                    break
+                parts.append(delta)
+                yield format_sse({"delta": delta})
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}")
+            yield format_sse({"error": str(e)}, event="error")
+            return
+        finally:
+            # Closing the stream drops the upstream connection, which stops the generation
+            await stream.aclose()
+            llm_scheduler.release()
+        
+        message = "".join(parts)
+        if turn.is_crisis:
+            message = f"{turn.crisis_message}\n\n{message}".rstrip()
+        if unsafe:
+            logger.warning(f"Unsafe model output ({unsafe.category}) - User ID: {user_id}, generation aborted")
+            message = prompt_helper.safety_monitor.crisis_template([unsafe.category])
+            crisis_resources = prompt_helper.safety_monitor.crisis_resources[unsafe.category]['resources']
+            # Tell the client to replace the partial reply with the crisis message
+            yield format_sse({"message": message}, event="replace")
+        
+        await adb.save_turn(
+            user_id,
+            ChatMessage(role="user", content=turn.message, mood=turn.mood),
+            ChatMessage(role="assistant", content=message)
+        )
+        
+        yield format_sse({
+            "message": message,
+            "emotional_state": turn.risk_level,
+            "crisis_resources": crisis_resources,
+            "ttft_ms": ttft_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/history")
-async def get_history(user_id: int = Depends(get_current_user_id)):
+async def get_history(
+    limit: int = 10,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    user_id: int = Depends(get_current_user_id)
+):
+    """Newest-first history page. Pass ``next_before_id`` back as ``before_id`` to
+    page into older messages; with ``after_id``, pass ``next_after_id`` back as
+    ``after_id`` to page into newer ones."""
     try:
-        history = db.get_chat_history(user_id)
-        return {"history": history}
+        limit = min(max(limit, 1), 100)
+        history = await adb.get_chat_history(user_id, limit, before_id, after_id)
+        full = len(history) == limit
+        if after_id is not None:
+            return {"history": history, "next_after_id": history[0].id if full else None}
+        return {"history": history, "next_before_id": history[-1].id if full else None}
     except Exception as e:
         logger.error(f"Error getting history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/history/export")
+async def export_history(include_archive: bool = False, user_id: int = Depends(get_current_user_id)):
+    """Stream the user's entire history as NDJSON, oldest first, in constant memory."""
+    async def ndjson_lines():
+        async for message in adb.iter_chat_history(user_id, include_archive=include_archive):
+            yield message.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="history-{user_id}.ndjson"'}
+    )
+
+@app.get("/history/search")
+async def search_history(
+    q: str,
+    limit: int = 20,
+    include_archive: bool = False,
+    user_id: int = Depends(get_current_user_id)
+):
+    try:
+        results = await adb.search_history(user_id, q, min(max(limit, 1), 100), include_archive)
+        return {"query": q, "results": results}
+    except Exception as e:
+        logger.error(f"Error searching history: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/analysis/mood")
 async def get_mood_analysis(user_id: int = Depends(get_current_user_id)):
     try:
         # Get chat history
-        history = db.get_chat_history(user_id)
+        history = await adb.get_chat_history(user_id)
         
         # Analyze moods
         analysis = session_analyzer.analyze_mood_trends(history)
@@ -109,43 +412,44 @@ async def get_mood_analysis(user_id: int = Depends(get_current_user_id)):
         logger.error(f"Error analyzing moods: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/reset")
-async def reset_profile(user_id: int = Depends(get_current_user_id)):
+@app.get("/analysis/mood/trends")
+async def get_mood_trends(
+    granularity: str = "day",
+    periods: int = 30,
+    user_id: int = Depends(get_current_user_id)
+):
+    """Mood series over the last ``periods`` days, weeks or months."""
+    if granularity not in TREND_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(TREND_GRANULARITIES)}")
     try:
-        # Implement profile reset logic
-        pass
+        periods = min(max(periods, 1), 366)
+        since = trend_window_start(granularity, periods)
+        return {
+            "granularity": granularity,
+            "since": since,
+            "trends": await adb.get_mood_trends(user_id, granularity, since),
+            "user_id": user_id
+        }
     except Exception as e:
-        logger.error(f"Error resetting profile: {e}")
+        logger.error(f"Error getting mood trends: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, user_id: int = Depends(get_current_user_id)):
+@app.get("/stats/llm")
+async def get_llm_stats():
+    stats = llm_scheduler.stats()
+    stats["cache"] = response_cache.stats()
+    stats["prompt"] = prompt_helper.prompt_builder.stats()
+    if isinstance(llm_client, LLMRouter):
+        stats["router"] = llm_client.stats()
+    return stats
+
+@app.post("/reset")
+async def reset_profile(user_id: int = Depends(get_current_user_id)):
     try:
-        # Check for crisis content
-        safety_check = prompt_helper.safety_monitor.analyze_message(request.message)
-        
-        # Log crisis detection for monitoring
-        if safety_check['risk_level'] in ['high', 'severe']:
-            logger.warning(f"Crisis detected - User ID: {user_id}, Risk Level: {safety_check['risk_level']}")
-            # Could add additional crisis protocols here
-        
-        # Continue with normal processing but with crisis awareness
-        messages = prompt_helper.format_conversation(
-            message=request.message,
-            mood=request.mood,
-            history=db.get_chat_history(user_id),
-            user_profile=db.get_user_profile(user_id)
-        )
-        
-        response = llm_client.generate_response(messages)
-        
-        return ChatResponse(
-            message=response["message"],
-            emotional_state=safety_check['risk_level'],
-            crisis_resources=safety_check.get('response', {}).get('resources', []) if safety_check['risk_level'] != 'normal' else None
-        )
+        deleted = await profile_cache.delete_user_profile(user_id)
+        return {"user_id": user_id, "reset": deleted}
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        logger.error(f"Error resetting profile: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
@@ -14,12 +14,28 @@ class ChatMessage(BaseModel):
     role: str
     content: str
     mood: Optional[str] = None
+    id: Optional[int] = None
+    timestamp: Optional[str] = None
 
 class ChatRequest(BaseModel):
     message: str
     mood: Optional[str] = None
     user_profile: Optional['UserProfile'] = None
+    # On crisis turns, also generate a personalized reply after the immediate one
+    crisis_follow_up: bool = True
 
 class ChatResponse(BaseModel):
     message: str
-    emotional_state: Optional[str] = None
\ No newline at end of file
+    emotional_state: Optional[str] = None
+    crisis_resources: Optional[List[str]] = None
+    # Set when a personalized follow-up is still generating; fetch it from /chat/follow-up
+    follow_up_id: Optional[str] = None
+
+class HistorySearchResult(BaseModel):
+    id: int
+    role: str
+    mood: Optional[str] = None
+    timestamp: Optional[str] = None
+    snippet: str
+    rank: float
+    archived: bool = False
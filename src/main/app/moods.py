@@ -0,0 +1,13 @@
+# Mood vocabulary shared by the session analyzer and the database's mood rollups
+
+# Intensity of each mood, also summed into the database's mood rollups
+MOOD_WEIGHTS = {
+    "happy": 1.0,
+    "motivated": 0.8,
+    "neutral": 0.5,
+    "stressed": -0.3,
+    "sad": -0.5,
+    "depressed": -0.8
+}
+
+TREND_GRANULARITIES = ("day", "week", "month")
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+from .async_database import AsyncDatabase
+from .models import UserProfile
+from .prompt_helper import PromptHelper
+
+@dataclass(frozen=True)
+class ProfileContext:
+    """A user's profile together with the system prompt rendered from it."""
+    profile: Optional[UserProfile]
+    system_prompt: str
+
+class ProfileContextCache:
+    """Bounded LRU of ProfileContext keyed by user id.
+
+    A steady-state chat turn reads neither the users table nor re-renders the
+    system prompt. Profile writes and resets go through this cache, which
+    writes through to the database and replaces or drops the cached entry.
+    Users without a profile are cached too, with the base prompt. A read that
+    was in flight when the user's profile was saved or reset is not cached, so
+    it cannot bring back the old profile.
+    """
+
+    def __init__(self, adb: AsyncDatabase, prompt_helper: PromptHelper, max_entries: int = 1024):
+        self.adb = adb
+        self.prompt_helper = prompt_helper
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, ProfileContext]" = OrderedDict()
+        # user id -> token of the newest read in flight, dropped by writes
+        self._loading: Dict[int, object] = {}
+
+    def _render(self, profile: Optional[UserProfile]) -> ProfileContext:
+        return ProfileContext(profile=profile, system_prompt=self.prompt_helper.get_system_prompt(profile))
+
+    def _store(self, user_id: int, context: ProfileContext):
+        self._entries[user_id] = context
+        self._entries.move_to_end(user_id)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_id: int) -> ProfileContext:
+        context = self._entries.get(user_id)
+        if context is not None:
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return context
+        self.misses += 1
+        token = self._loading[user_id] = object()
+        try:
+            context = self._render(await self.adb.get_user_profile(user_id))
+        finally:
+            current = self._loading.get(user_id) is token
+            if current:
+                del self._loading[user_id]
+        if current:
+            self._store(user_id, context)
+        return context
+
+    async def save_user_profile(self, profile: UserProfile) -> int:
+        user_id = await self.adb.save_user_profile(profile)
+        self._loading.pop(user_id, None)
+        self._store(user_id, self._render(profile))
+        return user_id
+
+    async def delete_user_profile(self, user_id: int) -> bool:
+        deleted = await self.adb.delete_user_profile(user_id)
+        self.invalidate(user_id)
+        return deleted
+
+    def invalidate(self, user_id: int):
+        self._loading.pop(user_id, None)
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
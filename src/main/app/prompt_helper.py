@@ -1,13 +1,9 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from .models import UserProfile, ChatMessage
 from .safety_monitor import SafetyMonitor
+from ai.prompt_builder import PromptBuilder
 
-class PromptHelper:
-    def __init__(self):
-        self.safety_monitor = SafetyMonitor()
-
-    def get_system_prompt(self, user_profile: Optional[UserProfile] = None) -> str:
-        base_prompt = """You are MindfulCompanion, a supportive AI wellness companion. Follow these guidelines:
+BASE_SYSTEM_PROMPT = """You are MindfulCompanion, a supportive AI wellness companion. Follow these guidelines:
 
 1. Therapeutic Approach:
    - Use active listening techniques
@@ -26,8 +22,19 @@ class PromptHelper:
    - Provide appropriate resources
    - Maintain consistent support"""
 
-        if user_profile:
-            context = f"""
+class PromptHelper:
+    def __init__(self):
+        self.safety_monitor = SafetyMonitor()
+        self.prompt_builder = PromptBuilder(BASE_SYSTEM_PROMPT)
+
+    def get_system_prompt(self, user_profile: Optional[UserProfile] = None) -> str:
+        """Base instructions followed by the profile, so the base stays a shared prefix."""
+        return self.prompt_builder.system_prompt(self._profile_context(user_profile))
+
+    def _profile_context(self, user_profile: Optional[UserProfile]) -> Optional[str]:
+        if not user_profile:
+            return None
+        return f"""
 Current User Context:
 - Age Group: {user_profile.age_category}
 - Key Concerns: {', '.join(user_profile.emotions)}
@@ -36,12 +43,13 @@ Current User Context:
 - Goals: {user_profile.goals}
 
 Adapt your therapeutic approach accordingly. They prefer {user_profile.interaction_style} communication."""
-            return base_prompt + context
-        return base_prompt
 
-    def format_conversation(self, message: str, mood: Optional[str], history: List[ChatMessage], user_profile: Optional[UserProfile]) -> list:
-        # First check for safety concerns
-        safety_check = self.safety_monitor.analyze_message(message)
+    def format_conversation(self, message: str, mood: Optional[str], history: List[ChatMessage], user_profile: Optional[UserProfile], safety_check: Optional[Dict] = None, system_prompt: Optional[str] = None, conversation: Optional[int] = None) -> list:
+        """``history`` is oldest first. Pass the user id as ``conversation`` so
+        consecutive turns share a prompt prefix the model server can reuse."""
+        # First check for safety concerns, unless the caller already analyzed this turn
+        if safety_check is None:
+            safety_check = self.safety_monitor.analyze_message(message)
         
         if safety_check['risk_level'] in ['high', 'severe']:
             # Modify system prompt for crisis response
@@ -51,20 +59,12 @@ Adapt your therapeutic approach accordingly. They prefer {user_profile.interacti
                 {"role": "user", "content": message}
             ]
 
-        # Normal conversation flow
-        messages = [{"role": "system", "content": self.get_system_prompt(user_profile)}]
-        
-        # Add relevant history (last 5 messages)
-        for msg in history[-5:]:
-            messages.append({"role": msg.role, "content": msg.content})
-        
-        # Add current message with mood if provided
-        current_message = message
-        if mood:
-            current_message = f"[Current Mood: {mood}] {message}"
-            
-        messages.append({"role": "user", "content": current_message})
-        return messages
+        # Normal conversation flow: instructions, profile, history, current turn
+        if system_prompt is None:
+            system_prompt = self.get_system_prompt(user_profile)
+        return self.prompt_builder.build(
+            message, history, system_prompt=system_prompt, mood=mood, conversation=conversation
+        )
 
     def _create_crisis_prompt(self, safety_check: dict) -> str:
         return f"""IMPORTANT: Crisis situation detected. Respond with:
@@ -1,5 +1,82 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 import re
+from ai.pattern_index import PatternIndex, REGEX_METACHARACTERS, REGEX_QUANTIFIERS
+
+class PatternMatch(NamedTuple):
+    category: str
+    pattern: str
+    start: int
+    end: int
+
+class CrisisPatternMatcher:
+    """Compiles every crisis pattern into a single regex and reports all hits in one pass."""
+
+    def __init__(self, crisis_patterns: Dict[str, List[str]]):
+        self.categories = list(crisis_patterns)
+        self._entries = [
+            (category, pattern)
+            for category, patterns in crisis_patterns.items()
+            for pattern in patterns
+        ]
+        self._index = PatternIndex([pattern for _, pattern in self._entries])
+
+    def scan(self, message: str) -> List[PatternMatch]:
+        return [
+            self._to_match(index, match.start(), match.end())
+            for index, match in self._index.iter_matches(message)
+        ]
+
+    def detect(self, message: str) -> List[Tuple[str, List[str]]]:
+        """Return (category, patterns) pairs in the same order as the per-pattern search."""
+        matched = {(match.category, match.pattern) for match in self.scan(message)}
+        detected = []
+        for category in self.categories:
+            patterns = [pattern for entry_category, pattern in self._entries
+                        if entry_category == category and (category, pattern) in matched]
+            if patterns:
+                detected.append((category, patterns))
+        return detected
+
+    def _to_match(self, index: int, start: int, end: int) -> PatternMatch:
+        category, pattern = self._entries[index]
+        return PatternMatch(category, pattern, start, end)
+
+class StreamSafetyScanner:
+    """Screens text as it streams in, catching matches that span chunk boundaries.
+
+    Each chunk is scanned together with a tail of the earlier text that is one
+    character shorter than the longest possible match. A match split across
+    chunks is therefore always seen, while old text is never rescanned in full.
+    One more character is kept in front of the tail so that anchors such as
+    ``\b`` see what preceded it; matches starting on that character are ignored.
+    A scanner without a matcher never matches.
+    """
+
+    def __init__(self, matcher: Optional[CrisisPatternMatcher], window: Optional[int]):
+        self.matcher = matcher
+        # None keeps the whole text, for patterns whose match length is unbounded
+        self.window = window
+        self._tail = ''
+        self._tail_offset = 0
+        self._context = 0
+
+    def feed(self, chunk: str) -> Optional[PatternMatch]:
+        """Return the first match involving this chunk, with offsets into the whole stream."""
+        if self.matcher is None:
+            return None
+        text = self._tail + chunk.lower()
+        text_offset = self._tail_offset
+        matches = [match for match in self.matcher.scan(text) if match.start >= self._context]
+
+        keep = len(text) if self.window is None else min(len(text), self.window + 1)
+        self._tail = text[len(text) - keep:]
+        self._tail_offset = text_offset + len(text) - keep
+        self._context = 1 if self.window is not None and keep == self.window + 1 else 0
+
+        if not matches:
+            return None
+        first = matches[0]
+        return first._replace(start=first.start + text_offset, end=first.end + text_offset)
 
 class SafetyMonitor:
     def __init__(self):
@@ -22,6 +99,21 @@ class SafetyMonitor:
             ]
         }
         
+        # Phrases that are unsafe in the assistant's own reply: first-person intent
+        # (the model speaking as the user) and harmful instructions. Topic words
+        # such as 'suicide' are left out, since a supportive reply may name the
+        # 988 Suicide & Crisis Lifeline or ask about self-harm.
+        self.output_patterns = {
+            'suicide_risk': [
+                r'kill myself', r'end my life', r'\bi want to die', r'\bi don\'t want to live',
+                r'you should kill yourself', r'you should end your life', r'lethal dose', r'fatal dose'
+            ],
+            'self_harm': [
+                r'hurt myself', r'harm myself', r'cut myself', r'burning myself',
+                r'you should hurt yourself', r'you should harm yourself', r'you should cut yourself'
+            ]
+        }
+
         self.crisis_resources = {
             'suicide_risk': {
                 'message': "I'm very concerned about your safety. Please know that you're not alone.",
@@ -47,6 +139,12 @@ class SafetyMonitor:
             }
         }
 
+        self.matcher = CrisisPatternMatcher(self.crisis_patterns)
+        # Emergency phrases are plain text, so a scan hit is the same as a substring check
+        self._literal_emergency_patterns = not any(
+            REGEX_METACHARACTERS.intersection(pattern) for pattern in self.crisis_patterns['emergency']
+        )
+
     def analyze_message(self, message: str) -> Dict:
         message = message.lower()
         detected_risks = self._detect_risk_patterns(message)
@@ -64,19 +162,68 @@ class SafetyMonitor:
             'response': response
         }
 
+    def stream_scanner(self, categories: Sequence[str] = ('suicide_risk', 'self_harm')) -> StreamSafetyScanner:
+        """Create a scanner for streamed model output.
+
+        Assistant text is screened against ``output_patterns`` for the given
+        categories, not the user-message patterns. A pattern that matches any of
+        the crisis messages or resources is dropped, so a reply that quotes them
+        (or the crisis template itself) is never aborted. If no pattern is left,
+        the scanner never matches."""
+        unknown = [category for category in categories if category not in self.output_patterns]
+        if unknown:
+            raise ValueError(f"No output patterns for categories: {', '.join(unknown)}")
+        known_text = [
+            text.lower()
+            for info in self.crisis_resources.values()
+            for text in [info['message'], *info['resources']]
+        ]
+        patterns = {
+            category: [
+                pattern for pattern in self.output_patterns[category]
+                if not any(re.search(pattern, text) for text in known_text)
+            ]
+            for category in categories
+        }
+        flat = [pattern for category_patterns in patterns.values() for pattern in category_patterns]
+        if not flat:
+            return StreamSafetyScanner(None, 0)
+        window = None
+        if not any(REGEX_QUANTIFIERS.intersection(pattern) for pattern in flat):
+            # Without quantifiers a match is never longer than its pattern source
+            window = max(len(pattern) for pattern in flat) - 1
+        return StreamSafetyScanner(CrisisPatternMatcher(patterns), window)
+
+    def crisis_template(self, risk_types: List[str], immediate_action: bool = False) -> str:
+        """Plain-text crisis message with the resources for the given risk types."""
+        response = self._generate_crisis_response({
+            'detected_risks': risk_types,
+            'immediate_action': immediate_action
+        })
+        lines = [response['message']]
+        if response['resources']:
+            lines.append("")
+            lines.extend(f"- {resource}" for resource in response['resources'])
+        for action in response['actions']:
+            lines.append("")
+            lines.append(action)
+        return "\n".join(lines)
+
+    def analyze_messages(self, messages: List[str]) -> List[Dict]:
+        """Screen a batch of messages, e.g. when re-checking stored chat history."""
+        return [self.analyze_message(message) for message in messages]
+
     def _detect_risk_patterns(self, message: str) -> List[Tuple[str, List[str]]]:
-        detected = []
-        for risk_type, patterns in self.crisis_patterns.items():
-            matches = [pattern for pattern in patterns if re.search(pattern, message)]
-            if matches:
-                detected.append((risk_type, matches))
-        return detected
+        return self.matcher.detect(message)
 
     def _assess_risk_level(self, detected_risks: List[Tuple[str, List[str]]], message: str) -> Dict:
         risk_types = [risk[0] for risk in detected_risks]
         
         # Check for immediate emergency indicators
-        immediate_risk = any(pattern in message for pattern in self.crisis_patterns['emergency'])
+        if self._literal_emergency_patterns:
+            immediate_risk = 'emergency' in risk_types
+        else:
+            immediate_risk = any(pattern in message for pattern in self.crisis_patterns['emergency'])
         
         risk_level = 'high'
         if immediate_risk:
@@ -1,18 +1,27 @@
 from collections import defaultdict
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime, timedelta
 from .models import ChatMessage
+from .moods import MOOD_WEIGHTS
+
+def trend_window_start(granularity: str, periods: int, today: Optional[date] = None) -> str:
+    """First bucket (ISO date) of a trend series covering the last ``periods`` buckets."""
+    today = today or datetime.utcnow().date()
+    periods = max(periods, 1)
+    if granularity == "day":
+        start = today - timedelta(days=periods - 1)
+    elif granularity == "week":
+        start = today - timedelta(days=today.weekday(), weeks=periods - 1)
+    elif granularity == "month":
+        months = today.year * 12 + today.month - 1 - (periods - 1)
+        start = date(months // 12, months % 12 + 1, 1)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return start.isoformat()
 
 class SessionAnalyzer:
     def __init__(self):
-        self.mood_weights = {
-            "happy": 1.0,
-            "motivated": 0.8,
-            "neutral": 0.5,
-            "stressed": -0.3,
-            "sad": -0.5,
-            "depressed": -0.8
-        }
+        self.mood_weights = dict(MOOD_WEIGHTS)
 
     def analyze_mood_trends(self, history: List[ChatMessage]) -> Dict[str, Any]:
         if not history:
@@ -26,7 +35,7 @@ class SessionAnalyzer:
                 mood_patterns[msg.mood] += 1
                 mood_progression.append({
                     "mood": msg.mood,
-                    "timestamp": datetime.now().isoformat(),  # In real implementation, use message timestamp
+                    "timestamp": msg.timestamp,
                     "intensity": self.mood_weights.get(msg.mood, 0)
                 })
 
@@ -0,0 +1,195 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from .database import Database
+from .models import UserProfile, ChatMessage, HistorySearchResult
+from .write_queue import WriteBehindError
+
+class ShardedDatabase:
+    """Database that spreads users over several SQLite files.
+
+    Profiles live in a small catalog database, which also hands out user ids.
+    Each user's chat history, mood rollups and search index live in the shard
+    ``user_id % shards``, or in a file of their own when ``shards`` is None.
+    Writes for users on different shards no longer wait on one writer lock.
+
+    Shards are opened on first use and at most ``max_open`` stay open; the least
+    recently used idle shard is closed (and its write-behind queue flushed)
+    when another one is needed.
+    """
+
+    def __init__(
+        self,
+        directory: str = "mindful_companion_shards",
+        shards: Optional[int] = 16,
+        max_open: int = 32,
+        write_behind: bool = False,
+        **database_options
+    ):
+        if shards is not None and shards < 1:
+            raise ValueError("shards must be at least 1, or None for one file per user")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shards = shards
+        self.max_open = max(max_open, 1)
+        self.write_behind = write_behind
+        self.database_options = database_options
+        self.catalog = Database(str(self.directory / "catalog.db"), **database_options)
+        # shard path -> Database, least recently used first
+        self._open: "OrderedDict[str, Database]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def shard_path(self, user_id: int) -> str:
+        if self.shards is None:
+            return str(self.directory / f"user-{user_id}.db")
+        return str(self.directory / f"shard-{user_id % self.shards:03d}.db")
+
+    def _shard(self, user_id: int):
+        return self._open_shard(self.shard_path(user_id))
+
+    @contextmanager
+    def _open_shard(self, path: str) -> Iterator[Database]:
+        with self._lock:
+            db = self._open.get(path)
+            if db is None:
+                db = Database(path, write_behind=self.write_behind, **self.database_options)
+                self._open[path] = db
+            self._open.move_to_end(path)
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+            evicted = self._evict_idle()
+        self._close_all(evicted)
+        try:
+            yield db
+        finally:
+            with self._lock:
+                self._in_use[path] -= 1
+                if not self._in_use[path]:
+                    del self._in_use[path]
+                evicted = self._evict_idle()
+            self._close_all(evicted)
+
+    def _evict_idle(self) -> List[Database]:
+        # Shards in use are never closed, so the cache may briefly exceed max_open
+        evicted = []
+        for path in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+            if path not in self._in_use:
+                evicted.append(self._open.pop(path))
+        return evicted
+
+    @staticmethod
+    def _close_all(databases: List[Database]):
+        # Close every shard before reporting a write-behind failure from any of them
+        error = None
+        for db in databases:
+            try:
+                db.close()
+            except WriteBehindError as e:
+                error = error or e
+        if error:
+            raise error
+
+    def open_shards(self) -> List[str]:
+        with self._lock:
+            return list(self._open)
+
+    def flush(self):
+        with self._lock:
+            databases = list(self._open.values())
+        for db in databases:
+            db.flush()
+
+    def close(self):
+        with self._lock:
+            databases = list(self._open.values())
+            self._open.clear()
+        self._close_all(databases)
+        self.catalog.close()
+
+    def save_user_profile(self, profile: UserProfile) -> int:
+        return self.catalog.save_user_profile(profile)
+
+    def get_user_profile(self, user_id: int) -> Optional[UserProfile]:
+        return self.catalog.get_user_profile(user_id)
+
+    def delete_user_profile(self, user_id: int) -> bool:
+        return self.catalog.delete_user_profile(user_id)
+
+    def save_chat_message(self, user_id: int, message: ChatMessage):
+        with self._shard(user_id) as db:
+            return db.save_chat_message(user_id, message)
+
+    def save_turn(self, user_id: int, user_message: ChatMessage, assistant_message: ChatMessage):
+        with self._shard(user_id) as db:
+            return db.save_turn(user_id, user_message, assistant_message)
+
+    def get_chat_history(
+        self,
+        user_id: int,
+        limit: int = 10,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> List[ChatMessage]:
+        with self._shard(user_id) as db:
+            return db.get_chat_history(user_id, limit, before_id, after_id)
+
+    def get_chat_history_page(self, user_id: int, after_id: int = 0, limit: int = 500) -> List[ChatMessage]:
+        with self._shard(user_id) as db:
+            return db.get_chat_history_page(user_id, after_id, limit)
+
+    def get_archived_batch(self, user_id: int, after_id: int = 0) -> List[ChatMessage]:
+        with self._shard(user_id) as db:
+            return db.get_archived_batch(user_id, after_id)
+
+    def iter_chat_history(
+        self,
+        user_id: int,
+        batch_size: int = 500,
+        include_archive: bool = False
+    ) -> Iterator[ChatMessage]:
+        """Yield the user's entire history oldest first, holding one batch in memory."""
+        for batch in self.iter_chat_history_batches(user_id, batch_size, include_archive):
+            yield from batch
+
+    def iter_chat_history_batches(
+        self,
+        user_id: int,
+        batch_size: int = 500,
+        include_archive: bool = False
+    ) -> Iterator[List[ChatMessage]]:
+        # The shard stays open, and is never evicted, until the iteration ends
+        with self._shard(user_id) as db:
+            yield from db.iter_chat_history_batches(user_id, batch_size, include_archive)
+
+    def get_mood_statistics(self, user_id: int) -> Dict[str, Any]:
+        with self._shard(user_id) as db:
+            return db.get_mood_statistics(user_id)
+
+    def get_mood_trends(self, user_id: int, granularity: str = "day", since: str = "") -> List[Dict[str, Any]]:
+        with self._shard(user_id) as db:
+            return db.get_mood_trends(user_id, granularity, since)
+
+    def search_history(
+        self,
+        user_id: int,
+        query: str,
+        limit: int = 20,
+        include_archive: bool = False
+    ) -> List[HistorySearchResult]:
+        with self._shard(user_id) as db:
+            return db.search_history(user_id, query, limit, include_archive)
+
+    def compact_history(self, older_than_days: int = 90, batch_size: int = 1000) -> Dict[str, int]:
+        """Archive old messages in every shard file on disk, one shard at a time."""
+        totals = {"archived_messages": 0, "archive_batches": 0, "freed_pages": 0}
+        pattern = "user-*.db" if self.shards is None else "shard-*.db"
+        for path in sorted(self.directory.glob(pattern)):
+            with self._open_shard(str(path)) as db:
+                stats = db.compact_history(older_than_days, batch_size)
+            for key in totals:
+                totals[key] += stats[key]
+        return totals
@@ -0,0 +1,75 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.async_database import AsyncDatabase
+from app.database import Database
+
+LIFELINE_REPLY = ["I'm really glad you told me. ", "Please call or text the 988 Suicide ", "& Crisis Lifeline now."]
+
+class FakeLLMClient:
+    def __init__(self, deltas, response=None):
+        self.deltas = deltas
+        self.response = response
+        self.requests = []
+
+    async def generate_response(self, messages, cacheable=False):
+        self.requests.append(messages)
+        return self.response
+
+    async def stream_response(self, messages):
+        self.requests.append(messages)
+        for delta in self.deltas:
+            yield delta
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # app.main opens its default database in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    from app import main
+    from app.profile_cache import ProfileContextCache
+    adb = AsyncDatabase(Database(str(tmp_path / "stream.db")))
+    monkeypatch.setattr(main, "adb", adb)
+    monkeypatch.setattr(main, "profile_cache", ProfileContextCache(adb, main.prompt_helper))
+    yield main
+    adb._shutdown()
+
+def stream_events(main, monkeypatch, deltas, message, **body):
+    monkeypatch.setattr(main, "llm_client", FakeLLMClient(deltas))
+    response = TestClient(main.app).post("/chat/stream", json={"message": message, **body})
+    assert response.status_code == 200
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event", "data"), json.loads(fields["data"])))
+    return events
+
+def test_reply_naming_the_lifeline_is_not_aborted(main, monkeypatch):
+    events = stream_events(main, monkeypatch, LIFELINE_REPLY, "I feel a bit down today")
+    assert [name for name, _ in events] == ["data"] * len(LIFELINE_REPLY) + ["done"]
+    assert events[-1][1]["message"] == "".join(LIFELINE_REPLY)
+
+def test_unsafe_reply_is_replaced(main, monkeypatch):
+    events = stream_events(main, monkeypatch, ["Sometimes I want to ", "kill myself too."], "I feel a bit down today")
+    assert [name for name, _ in events] == ["data", "replace", "done"]
+    assert "988 Suicide & Crisis Lifeline" in events[1][1]["message"]
+
+def test_crisis_event_comes_first_and_follow_up_is_streamed(main, monkeypatch):
+    async def no_history(*args, **kwargs):
+        raise AssertionError("history read for a crisis prompt")
+    monkeypatch.setattr(main.adb, "get_chat_history", no_history)
+
+    events = stream_events(main, monkeypatch, LIFELINE_REPLY, "I want to end my life")
+    assert [name for name, _ in events] == ["crisis"] + ["data"] * len(LIFELINE_REPLY) + ["done"]
+    crisis_message = events[0][1]["message"]
+    assert events[-1][1]["message"] == f"{crisis_message}\n\n{''.join(LIFELINE_REPLY)}"
+    # The follow-up is generated from the crisis prompt alone
+    assert [m["role"] for m in main.llm_client.requests[0]] == ["system", "user"]
+
+def test_chat_returns_503_and_keeps_the_message_when_the_model_fails(main, monkeypatch):
+    failure = {"error": "No LLM backend available", "status": "unavailable"}
+    monkeypatch.setattr(main, "llm_client", FakeLLMClient([], response=failure))
+    response = TestClient(main.app).post("/chat", json={"message": "I feel a bit down today"})
+    assert response.status_code == 503
+    assert response.json()["detail"] == "No LLM backend available"
+    history = main.adb.db.get_chat_history(1)
+    assert [(m.role, m.content) for m in history] == [("user", "I feel a bit down today")]
@@ -0,0 +1,278 @@
+import asyncio
+import threading
+import pytest
+from app.database import Database, MIGRATIONS, HOT_QUERY_INDEXES
+from app.moods import MOOD_WEIGHTS
+from app.async_database import AsyncDatabase
+from app.write_queue import WriteBehindError
+from app.models import ChatMessage
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+def test_profile_round_trip(db, profile):
+    user_id = db.save_user_profile(profile)
+    assert db.get_user_profile(user_id) == profile
+
+def test_connection_reused_within_thread(db):
+    with db.get_connection() as first, db.get_connection() as second:
+        assert first is second
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_connections_are_per_thread(db):
+    seen = []
+    def worker():
+        with db.get_connection() as conn:
+            seen.append(conn)
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    with db.get_connection() as conn:
+        assert seen[0] is not conn
+
+def test_reader_not_blocked_by_open_write(db):
+    user_id = 1
+    db.save_chat_message(user_id, ChatMessage(role="user", content="first", mood="sad"))
+    with db.get_connection() as writer:
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("INSERT INTO chat_history (user_id, role, content) VALUES (?, ?, ?)", (user_id, "user", "pending"))
+        result = []
+        reader = threading.Thread(target=lambda: result.append(db.get_chat_history(user_id)))
+        reader.start()
+        reader.join(timeout=2)
+        writer.commit()
+    assert [message.content for message in result[0]] == ["first"]
+
+def test_failed_statement_rolls_back(db):
+    with pytest.raises(Exception):
+        with db.get_connection() as conn:
+            conn.execute("INSERT INTO chat_history (user_id, role, content) VALUES (1, 'user', 'lost')")
+            conn.execute("INSERT INTO missing_table VALUES (1)")
+    assert db.get_chat_history(1) == []
+
+def test_migrations_applied_once(db, tmp_path):
+    assert db.schema_version() == MIGRATIONS[-1][0]
+    reopened = Database(db.db_path)
+    assert reopened.schema_version() == MIGRATIONS[-1][0]
+    reopened.close()
+
+def test_hot_queries_use_indexes(db):
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, role, content, mood) VALUES (?, ?, ?, ?)",
+            [(user_id % 50, "user", f"message {user_id}", "sad") for user_id in range(2000)]
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+    plans = db.check_query_plans()
+    assert set(plans) == set(HOT_QUERY_INDEXES)
+    with db.get_connection() as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_chat_history_user_mood" not in indexes
+
+def test_save_turn_writes_both_messages(db):
+    db.save_turn(1, ChatMessage(role="user", content="hi", mood="happy"), ChatMessage(role="assistant", content="hello"))
+    assert sorted(message.role for message in db.get_chat_history(1)) == ["assistant", "user"]
+
+def test_write_behind_group_commits_concurrent_turns(tmp_path):
+    db = Database(str(tmp_path / "queued.db"), write_behind=True)
+    commits = []
+    write_rows = db._write_chat_rows
+    db._write_queue.write_rows = lambda rows: (commits.append(len(rows)), write_rows(rows))
+
+    threads = [
+        threading.Thread(target=db.save_turn, args=(
+            1, ChatMessage(role="user", content=f"turn {i}"), ChatMessage(role="assistant", content=f"reply {i}")
+        ))
+        for i in range(50)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.flush()
+
+    assert sum(commits) == 100
+    assert len(commits) < 50
+    assert len(db.get_chat_history(1, limit=200)) == 100
+    db.close()
+
+def test_close_flushes_pending_writes(tmp_path):
+    path = str(tmp_path / "queued.db")
+    db = Database(path, write_behind=True)
+    db._write_queue.max_delay = 10
+    db.save_turn(1, ChatMessage(role="user", content="hi"), ChatMessage(role="assistant", content="hello"))
+    db.close()
+    reopened = Database(path)
+    assert len(reopened.get_chat_history(1)) == 2
+    reopened.close()
+
+def test_failed_group_commit_is_retried_then_surfaced(tmp_path):
+    db = Database(str(tmp_path / "queued.db"), write_behind=True)
+    write_rows = db._write_chat_rows
+    failures = [RuntimeError("disk I/O error")]
+    def flaky(rows):
+        if failures:
+            raise failures.pop()
+        write_rows(rows)
+    db._write_queue.write_rows = flaky
+    db.save_turn(1, ChatMessage(role="user", content="hi"), ChatMessage(role="assistant", content="hello"))
+    db.flush()
+    assert len(db.get_chat_history(1)) == 2
+
+    failures.extend([RuntimeError("disk full")] * 2)
+    db.save_turn(1, ChatMessage(role="user", content="again"), ChatMessage(role="assistant", content="lost"))
+    with pytest.raises(WriteBehindError, match="2 queued chat rows"):
+        db.flush()
+    # The failure is reported once
+    db.flush()
+    db.close()
+
+@pytest.mark.asyncio
+async def test_async_database_round_trip(tmp_path, profile):
+    adb = AsyncDatabase(Database(str(tmp_path / "async.db")), max_readers=2)
+    user_id = await adb.save_user_profile(profile)
+    await adb.save_turn(user_id, ChatMessage(role="user", content="hi", mood="happy"), ChatMessage(role="assistant", content="hello"))
+    loaded, history, moods = await asyncio.gather(
+        adb.get_user_profile(user_id),
+        adb.get_chat_history(user_id),
+        adb.get_mood_statistics(user_id)
+    )
+    assert loaded == profile
+    assert len(history) == 2
+    assert moods == {"happy": 1}
+    await adb.close()
+
+def test_search_history_ranks_matches(db):
+    db.save_turn(1, ChatMessage(role="user", content="My boss yelled at me in the meeting"), ChatMessage(role="assistant", content="That sounds stressful"))
+    db.save_turn(1, ChatMessage(role="user", content="I slept well last night"), ChatMessage(role="assistant", content="Glad to hear it"))
+    db.save_chat_message(2, ChatMessage(role="user", content="My boss is great"))
+
+    results = db.search_history(1, "when did I last talk about my boss?")
+    assert [result.snippet for result in results] == ["My [boss] yelled at me in the meeting"]
+    assert db.search_history(1, 'boss" OR *') != []
+    assert db.search_history(1, "?!") == []
+
+def test_search_terms_only_match_message_content(db):
+    db.save_chat_message(7, ChatMessage(role="user", content="slept badly"))
+    db.save_chat_message(7, ChatMessage(role="user", content="day 7 of the new routine"))
+    db.save_chat_message(8, ChatMessage(role="user", content="day 7 for me too"))
+    # The user's id is indexed too, but query terms never match it
+    assert [result.snippet for result in db.search_history(7, "7")] == ["day [7] of the new routine"]
+
+def test_search_index_follows_deletes(db):
+    db.save_chat_message(1, ChatMessage(role="user", content="talking about my boss"))
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM chat_history")
+        conn.commit()
+    assert db.search_history(1, "boss") == []
+
+def test_keyset_pagination(db):
+    for i in range(25):
+        db.save_chat_message(1, ChatMessage(role="user", content=f"message {i}"))
+    db.save_chat_message(2, ChatMessage(role="user", content="other user"))
+
+    first = db.get_chat_history(1, limit=10)
+    assert [m.content for m in first] == [f"message {i}" for i in range(24, 14, -1)]
+    second = db.get_chat_history(1, limit=10, before_id=first[-1].id)
+    assert [m.content for m in second] == [f"message {i}" for i in range(14, 4, -1)]
+    newer = db.get_chat_history(1, limit=3, after_id=second[0].id)
+    assert [m.content for m in newer] == ["message 17", "message 16", "message 15"]
+
+def test_iter_chat_history_streams_in_batches(db):
+    for i in range(7):
+        db.save_chat_message(1, ChatMessage(role="user", content=f"message {i}"))
+    exported = list(db.iter_chat_history(1, batch_size=3))
+    assert [m.content for m in exported] == [f"message {i}" for i in range(7)]
+
+def test_mood_rollups_follow_inserts(db):
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, role, content, mood, timestamp) VALUES (1, 'user', 'x', ?, ?)",
+            [
+                ("sad", "2024-03-04 09:00:00"),
+                ("sad", "2024-03-04 21:00:00"),
+                ("happy", "2024-03-10 12:00:00"),
+                ("happy", "2024-04-01 08:00:00"),
+            ]
+        )
+        conn.commit()
+    db.save_turn(1, ChatMessage(role="user", content="hi", mood="stressed"), ChatMessage(role="assistant", content="hello"))
+
+    assert db.get_mood_statistics(1) == {"sad": 2, "happy": 2, "stressed": 1}
+    daily = db.get_mood_trends(1, "day", "2024-03-01")
+    assert daily[0] == {"bucket": "2024-03-04", "count": 2, "moods": {"sad": 2}, "avg_intensity": -0.5}
+    weekly = db.get_mood_trends(1, "week", "2024-03-01")
+    # Monday 4 March through Sunday 10 March fall in one week
+    assert weekly[0]["bucket"] == "2024-03-04" and weekly[0]["moods"] == {"happy": 1, "sad": 2}
+    monthly = db.get_mood_trends(1, "month", "2024-03-01")
+    assert [point["bucket"] for point in monthly[:2]] == ["2024-03-01", "2024-04-01"]
+    assert db.get_mood_trends(1, "month", "2024-04-01")[0]["count"] == 1
+
+def test_mood_rollups_backfilled_by_migration(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "legacy.db")
+    db = Database(path)
+    db.close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE mood_rollups")
+    conn.execute("DROP TABLE mood_weights")
+    conn.execute("DROP TRIGGER mood_rollups_insert")
+    conn.execute("INSERT INTO chat_history (user_id, role, content, mood) VALUES (1, 'user', 'x', 'sad')")
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+    conn.close()
+    reopened = Database(path)
+    assert reopened.get_mood_statistics(1) == {"sad": 1}
+    with reopened.get_connection() as conn:
+        assert dict(conn.execute("SELECT mood, weight FROM mood_weights").fetchall()) == MOOD_WEIGHTS
+    reopened.close()
+
+def insert_dated_messages(db, rows):
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, role, content, mood, timestamp) VALUES (?, 'user', ?, 'sad', ?)",
+            rows
+        )
+        conn.commit()
+
+def test_compaction_moves_old_messages_to_archive(db):
+    insert_dated_messages(db, [
+        (1, f"old worry about work {i}", f"2020-01-{i + 1:02d} 10:00:00") for i in range(5)
+    ] + [
+        (1, "february note about sleep", "2020-02-03 10:00:00"),
+        (2, "someone else's old message", "2020-01-05 10:00:00"),
+    ])
+    db.save_chat_message(1, ChatMessage(role="user", content="recent message about work"))
+
+    stats = db.compact_history(older_than_days=30, batch_size=3)
+    assert stats["archived_messages"] == 7
+    # January for user 1 splits into two batches; February and user 2 get one each
+    assert stats["archive_batches"] == 4
+    assert [m.content for m in db.get_chat_history(1)] == ["recent message about work"]
+    assert db.get_mood_statistics(1) == {"sad": 6}
+
+    exported = [m.content for m in db.iter_chat_history(1, include_archive=True)]
+    assert exported == [f"old worry about work {i}" for i in range(5)] + [
+        "february note about sleep", "recent message about work"
+    ]
+    assert db.compact_history(older_than_days=30)["archived_messages"] == 0
+
+def test_archived_messages_searchable_on_demand(db):
+    insert_dated_messages(db, [(1, "I argued with my boss again", "2020-01-05 10:00:00")])
+    db.save_chat_message(1, ChatMessage(role="user", content="my boss praised me today"))
+    db.compact_history(older_than_days=30)
+
+    assert [r.snippet for r in db.search_history(1, "boss")] == ["my [boss] praised me today"]
+    results = db.search_history(1, "boss", include_archive=True)
+    assert [(r.archived, r.snippet) for r in results] == [
+        (False, "my [boss] praised me today"),
+        (True, "I argued with my [boss] again"),
+    ]
+
+def test_new_databases_use_incremental_vacuum(db):
+    with db.get_connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from app.follow_ups import FollowUpRegistry
+from app.safety_monitor import SafetyMonitor
+from app.turn_context import TurnAnalyzer
+
+def test_crisis_turn_carries_template():
+    monitor = SafetyMonitor()
+    turn = TurnAnalyzer(monitor).analyze("I want to kill myself")
+    assert turn.is_crisis
+    assert turn.crisis_message == monitor.crisis_template(['suicide_risk'])
+    assert all(resource in turn.crisis_message for resource in turn.crisis_resources)
+    assert TurnAnalyzer(monitor).analyze("Work was fine today").crisis_message is None
+
+@pytest.mark.asyncio
+async def test_follow_up_fetched_when_ready():
+    registry = FollowUpRegistry()
+    release = asyncio.Event()
+
+    async def generate():
+        await release.wait()
+        return "personalized reply"
+
+    follow_up_id = registry.start(generate())
+    assert await registry.get(follow_up_id) == {"status": "pending", "message": None}
+    release.set()
+    assert await registry.get(follow_up_id, wait=1.0) == {"status": "ready", "message": "personalized reply"}
+    assert await registry.get("unknown") is None
+
+@pytest.mark.asyncio
+async def test_failed_follow_up_and_bounded_registry():
+    registry = FollowUpRegistry(max_entries=1)
+
+    async def fail():
+        raise RuntimeError("model unavailable")
+
+    failed = registry.start(fail())
+    assert (await registry.get(failed, wait=1.0))["status"] == "failed"
+    registry.start(asyncio.sleep(0, result="later"))
+    assert await registry.get(failed) is None
+    await registry.close()
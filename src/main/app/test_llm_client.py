@@ -0,0 +1,75 @@
+import asyncio
+import json
+import time
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.llm_client import AsyncLLMClient
+
+async def start_stub_server(handler) -> TestServer:
+    stub = web.Application()
+    stub.router.add_post("/v1/chat/completions", handler)
+    server = TestServer(stub)
+    await server.start_server()
+    return server
+
+async def slow_completion(request):
+    await asyncio.sleep(0.2)
+    return web.json_response({
+        "choices": [{"message": {"content": "Stub reply"}}],
+        "usage": {"total_tokens": 3}
+    })
+
+@pytest.mark.asyncio
+async def test_generate_response_contract():
+    server = await start_stub_server(slow_completion)
+    try:
+        async with AsyncLLMClient(base_url=str(server.make_url("")).rstrip("/")) as client:
+            response = await client.generate_response([{"role": "user", "content": "Hello"}])
+        assert response == {"message": "Stub reply", "usage": {"total_tokens": 3}, "status": "success"}
+    finally:
+        await server.close()
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_overlap():
+    server = await start_stub_server(slow_completion)
+    try:
+        async with AsyncLLMClient(base_url=str(server.make_url("")).rstrip("/"), pool_size=5) as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.generate_response([{"role": "user", "content": f"Message {i}"}]) for i in range(5)
+            ])
+            elapsed = time.perf_counter() - started
+        assert all(response["status"] == "success" for response in responses)
+        assert elapsed < 0.6  # five sequential calls would take at least 1s
+    finally:
+        await server.close()
+
+@pytest.mark.asyncio
+async def test_read_timeout():
+    server = await start_stub_server(slow_completion)
+    try:
+        async with AsyncLLMClient(base_url=str(server.make_url("")).rstrip("/"), read_timeout=0.05) as client:
+            response = await client.generate_response([{"role": "user", "content": "Hello"}])
+        assert response["status"] == "timeout"
+    finally:
+        await server.close()
+
+async def streaming_completion(request):
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for token in ["I hear ", "you", "."]:
+        chunk = {"choices": [{"delta": {"content": token}}]}
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await response.write(b"data: [DONE]\n\n")
+    return response
+
+@pytest.mark.asyncio
+async def test_stream_response_yields_deltas():
+    server = await start_stub_server(streaming_completion)
+    try:
+        async with AsyncLLMClient(base_url=str(server.make_url("")).rstrip("/")) as client:
+            deltas = [delta async for delta in client.stream_response([{"role": "user", "content": "Hi"}])]
+        assert deltas == ["I hear ", "you", "."]
+    finally:
+        await server.close()
@@ -0,0 +1,135 @@
+import asyncio
+import time
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.llm_router import LLMRouter, CircuitBreaker
+
+async def start_backend(delay: float = 0.0, status: int = 200, healthy: bool = True) -> TestServer:
+    async def completion(request):
+        await asyncio.sleep(delay)
+        if status != 200:
+            return web.Response(status=status, text="Backend failure")
+        return web.json_response({
+            "choices": [{"message": {"content": f"reply from {request.url.port}"}}],
+            "usage": {}
+        })
+
+    async def models(request):
+        return web.json_response({"data": []}, status=200 if healthy else 503)
+
+    stub = web.Application()
+    stub.router.add_post("/v1/chat/completions", completion)
+    stub.router.add_get("/v1/models", models)
+    server = TestServer(stub)
+    await server.start_server()
+    return server
+
+def url(server: TestServer) -> str:
+    return str(server.make_url("")).rstrip("/")
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+@pytest.mark.asyncio
+async def test_least_outstanding_requests_spreads_load():
+    servers = [await start_backend(delay=0.1), await start_backend(delay=0.1)]
+    try:
+        async with LLMRouter([url(s) for s in servers], probe_interval=0) as router:
+            responses = await asyncio.gather(*[router.generate_response(MESSAGES) for _ in range(4)])
+            assert all(r["status"] == "success" for r in responses)
+            assert [backend.requests for backend in router.backends] == [2, 2]
+    finally:
+        for server in servers:
+            await server.close()
+
+@pytest.mark.asyncio
+async def test_failures_fail_over_and_open_breaker():
+    broken, working = await start_backend(status=500), await start_backend()
+    try:
+        async with LLMRouter([url(broken), url(working)], probe_interval=0, failure_threshold=2) as router:
+            for _ in range(4):
+                response = await router.generate_response(MESSAGES)
+                assert response["message"] == f"reply from {working.port}"
+            assert router.backends[0].breaker.state == CircuitBreaker.OPEN
+            assert router.backends[0].failures == 2
+    finally:
+        await broken.close()
+        await working.close()
+
+@pytest.mark.asyncio
+async def test_open_breaker_recovers_after_reset_timeout():
+    calls = 0
+
+    async def completion(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return web.Response(status=500, text="Backend failure")
+        return web.json_response({"choices": [{"message": {"content": "recovered"}}], "usage": {}})
+
+    stub = web.Application()
+    stub.router.add_post("/v1/chat/completions", completion)
+    server = TestServer(stub)
+    await server.start_server()
+    try:
+        async with LLMRouter([url(server)], probe_interval=0, failure_threshold=1, reset_timeout=0.05) as router:
+            assert (await router.generate_response(MESSAGES))["status"] != "success"
+            assert (await router.generate_response(MESSAGES))["status"] == "unavailable"
+            await asyncio.sleep(0.06)
+            # The half-open trial succeeds and closes the breaker
+            assert (await router.generate_response(MESSAGES))["message"] == "recovered"
+            assert router.backends[0].breaker.state == CircuitBreaker.CLOSED
+            assert (await router.generate_response(MESSAGES))["message"] == "recovered"
+            assert calls == 3
+    finally:
+        await server.close()
+
+@pytest.mark.asyncio
+async def test_health_probe_takes_backend_out_of_rotation():
+    down, up = await start_backend(healthy=False), await start_backend()
+    try:
+        async with LLMRouter([url(down), url(up)], probe_interval=0) as router:
+            await router.probe()
+            assert [backend.healthy for backend in router.backends] == [False, True]
+            for _ in range(3):
+                await router.generate_response(MESSAGES)
+            assert router.backends[0].requests == 0
+    finally:
+        await down.close()
+        await up.close()
+
+@pytest.mark.asyncio
+async def test_hedged_request_cuts_tail_latency():
+    slow, fast = await start_backend(delay=1.0), await start_backend(delay=0.01)
+    try:
+        async with LLMRouter([url(slow), url(fast)], probe_interval=0, hedge_percentile=0.95, hedge_min_samples=1) as router:
+            router._latencies.extend([0.05] * 10)
+            for _ in range(2):
+                started = time.perf_counter()
+                response = await router.generate_response(MESSAGES)
+                assert time.perf_counter() - started < 0.5
+                assert response["message"] == f"reply from {fast.port}"
+            assert router.hedges == 1 and router.hedge_wins == 1
+    finally:
+        await slow.close()
+        await fast.close()
+
+@pytest.mark.asyncio
+async def test_stream_routes_to_backend():
+    async def streaming(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b'data: {"choices": [{"delta": {"content": "hi"}}]}\n\n')
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    stub = web.Application()
+    stub.router.add_post("/v1/chat/completions", streaming)
+    server = TestServer(stub)
+    await server.start_server()
+    try:
+        async with LLMRouter([url(server)], probe_interval=0) as router:
+            assert [delta async for delta in router.stream_response(MESSAGES)] == ["hi"]
+            assert router.backends[0].outstanding == 0
+    finally:
+        await server.close()
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from app.llm_scheduler import (
+    LLMScheduler, QueueFullError, PRIORITY_CRISIS, PRIORITY_ELEVATED, PRIORITY_NORMAL,
+    priority_for_risk_level, priority_for_response_type
+)
+
+def test_priority_mapping():
+    assert priority_for_risk_level("severe") == PRIORITY_CRISIS
+    assert priority_for_risk_level("high") == PRIORITY_CRISIS
+    assert priority_for_risk_level("normal") == PRIORITY_NORMAL
+    assert priority_for_response_type("crisis_intervention") == PRIORITY_CRISIS
+    assert priority_for_response_type("grounding") == PRIORITY_ELEVATED
+    assert priority_for_response_type("rapport_building") == PRIORITY_NORMAL
+
+@pytest.mark.asyncio
+async def test_crisis_served_before_earlier_chatter():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+    gate = asyncio.Event()
+
+    async def generate(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            if name == "first":
+                await gate.wait()
+
+    first = asyncio.create_task(generate("first", PRIORITY_NORMAL))
+    await asyncio.sleep(0)
+    waiting = [
+        asyncio.create_task(generate("chatter-1", PRIORITY_NORMAL)),
+        asyncio.create_task(generate("chatter-2", PRIORITY_NORMAL)),
+        asyncio.create_task(generate("crisis", PRIORITY_CRISIS)),
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 3
+    gate.set()
+    await asyncio.gather(first, *waiting)
+    assert order == ["first", "crisis", "chatter-1", "chatter-2"]
+    assert scheduler.active == 0
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    scheduler = LLMScheduler(max_concurrency=2)
+    peak = 0
+
+    async def generate():
+        nonlocal peak
+        async with scheduler.slot():
+            peak = max(peak, scheduler.active)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[generate() for _ in range(6)])
+    assert peak == 2
+    assert scheduler.stats()["waits"]["normal"]["count"] == 6
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1)
+    await scheduler.acquire()
+    queued = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFullError):
+        await scheduler.acquire(PRIORITY_CRISIS)
+    assert scheduler.stats()["rejected"] == 1
+    scheduler.release()
+    await queued
+    scheduler.release()
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    scheduler = LLMScheduler(max_concurrency=1)
+    await scheduler.acquire()
+    waiter = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.queue_depth == 0
+    scheduler.release()
+    assert scheduler.active == 0
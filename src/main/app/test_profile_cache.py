@@ -0,0 +1,79 @@
+import pytest
+from app.async_database import AsyncDatabase
+from app.database import Database
+from app.profile_cache import ProfileContextCache
+from app.prompt_helper import PromptHelper
+
+@pytest.fixture
+def adb(tmp_path):
+    adb = AsyncDatabase(Database(str(tmp_path / "cache.db")))
+    yield adb
+    adb._shutdown()
+
+class CountingPromptHelper(PromptHelper):
+    def __init__(self):
+        super().__init__()
+        self.renders = 0
+
+    def get_system_prompt(self, user_profile=None):
+        self.renders += 1
+        return super().get_system_prompt(user_profile)
+
+@pytest.mark.asyncio
+async def test_steady_state_turns_skip_io_and_rendering(adb, profile, monkeypatch):
+    helper = CountingPromptHelper()
+    cache = ProfileContextCache(adb, helper)
+    user_id = await adb.save_user_profile(profile)
+
+    first = await cache.get(user_id)
+    assert first.profile == profile
+    assert "Goals: Better stress management" in first.system_prompt
+
+    async def no_io(user_id):
+        raise AssertionError("profile read on a cache hit")
+    monkeypatch.setattr(adb, "get_user_profile", no_io)
+    for _ in range(3):
+        assert await cache.get(user_id) is first
+    assert helper.renders == 1
+    assert cache.stats() == {"entries": 1, "hits": 3, "misses": 1}
+
+@pytest.mark.asyncio
+async def test_save_writes_through(adb, profile):
+    cache = ProfileContextCache(adb, PromptHelper())
+    assert (await cache.get(1)).profile is None
+    user_id = await cache.save_user_profile(profile)
+    assert user_id == 1
+    assert (await cache.get(1)).profile == profile
+    assert cache.misses == 1
+
+@pytest.mark.asyncio
+async def test_reset_invalidates(adb, profile):
+    cache = ProfileContextCache(adb, PromptHelper())
+    user_id = await cache.save_user_profile(profile)
+    assert await cache.delete_user_profile(user_id)
+    context = await cache.get(user_id)
+    assert context.profile is None
+    assert "Current User Context" not in context.system_prompt
+
+@pytest.mark.asyncio
+async def test_bounded_lru(adb):
+    cache = ProfileContextCache(adb, PromptHelper(), max_entries=2)
+    for user_id in (1, 2, 1, 3):
+        await cache.get(user_id)
+    assert list(cache._entries) == [1, 3]
+
+@pytest.mark.asyncio
+async def test_read_in_flight_during_reset_is_not_cached(adb, profile, monkeypatch):
+    cache = ProfileContextCache(adb, PromptHelper())
+    user_id = await adb.save_user_profile(profile)
+    read_user_profile = adb.get_user_profile
+
+    async def read_then_reset(user_id):
+        loaded = await read_user_profile(user_id)
+        await cache.delete_user_profile(user_id)
+        return loaded
+    monkeypatch.setattr(adb, "get_user_profile", read_then_reset)
+    assert (await cache.get(user_id)).profile == profile
+
+    monkeypatch.setattr(adb, "get_user_profile", read_user_profile)
+    assert (await cache.get(user_id)).profile is None
@@ -0,0 +1,66 @@
+from app.models import ChatMessage, UserProfile
+from ai.prompt_builder import PromptBuilder
+from app.prompt_helper import PromptHelper, BASE_SYSTEM_PROMPT
+
+def conversation(turns: int):
+    history = []
+    for turn in range(turns):
+        history.append(ChatMessage(id=2 * turn + 1, role="user", content=f"question {turn}", mood="calm"))
+        history.append(ChatMessage(id=2 * turn + 2, role="assistant", content=f"answer {turn}"))
+    return history
+
+def test_layout_runs_from_static_to_dynamic():
+    builder = PromptBuilder("Base instructions.")
+    system = builder.system_prompt("\nProfile: likes walks")
+    messages = builder.build("how are you", conversation(1), system_prompt=system, mood="tired")
+    assert messages == [
+        {"role": "system", "content": "Base instructions.\nProfile: likes walks"},
+        {"role": "user", "content": "[Current Mood: calm] question 0"},
+        {"role": "assistant", "content": "answer 0"},
+        {"role": "user", "content": "[Current Mood: tired] how are you"},
+    ]
+
+def test_base_prompt_is_shared_prefix_across_profiles():
+    helper = PromptHelper()
+    profile = UserProfile(
+        name="Test User", age_category="20-40", emotions=["stress"], therapy_status="none",
+        interaction_style="direct", stress_level="low", goals="Sleep better"
+    )
+    assert helper.get_system_prompt().startswith(BASE_SYSTEM_PROMPT)
+    assert helper.get_system_prompt(profile).startswith(BASE_SYSTEM_PROMPT)
+
+def test_each_prompt_extends_the_previous_until_the_window_steps():
+    builder = PromptBuilder("Base.", max_history=6, min_history=2)
+    previous = None
+    restarts = 0
+    for turn in range(8):
+        history = conversation(turn)
+        messages = builder.build(f"question {turn}", history[-6:], mood="calm", conversation=7)
+        assert len(messages) - 2 <= 6
+        if previous is not None:
+            if messages[:len(previous)] == previous:
+                assert messages[len(previous)]["content"] == f"answer {turn - 1}"
+            else:
+                restarts += 1
+                assert len(messages) - 2 == 2
+        previous = messages
+    # The window grows 2 -> 4 -> 6 messages before it steps back to 2
+    assert restarts == 2
+    stats = builder.stats()
+    assert stats["prompts"] == 8
+    assert 0.5 < stats["prefix_share"] < 1
+
+def test_conversations_are_tracked_separately():
+    builder = PromptBuilder("Base.", max_conversations=1)
+    builder.build("hello", conversation=1)
+    builder.build("hello", conversation=2)
+    assert builder.stats()["conversations"] == 1
+    # A conversation's first prompt shares nothing with another's
+    assert builder.stats()["prefix_tokens"] == 0
+
+def test_format_conversation_orders_history_oldest_first():
+    helper = PromptHelper()
+    messages = helper.format_conversation("next", None, conversation(2), None, conversation=1)
+    assert [m["content"] for m in messages[1:]] == [
+        "[Current Mood: calm] question 0", "answer 0", "[Current Mood: calm] question 1", "answer 1", "next"
+    ]
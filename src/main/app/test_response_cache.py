@@ -0,0 +1,33 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from ai.response_cache import ResponseCache
+from app.llm_client import AsyncLLMClient
+
+@pytest.mark.asyncio
+async def test_client_serves_repeats_from_cache_and_bypasses_unsafe_turns():
+    calls = 0
+
+    async def completion(request):
+        nonlocal calls
+        calls += 1
+        return web.json_response({"choices": [{"message": {"content": f"reply {calls}"}}], "usage": {}})
+
+    stub = web.Application()
+    stub.router.add_post("/v1/chat/completions", completion)
+    server = TestServer(stub)
+    await server.start_server()
+    cache = ResponseCache()
+    try:
+        async with AsyncLLMClient(base_url=str(server.make_url("")).rstrip("/"), response_cache=cache) as client:
+            first = await client.generate_response([{"role": "user", "content": "Hi"}], cacheable=True)
+            repeat = await client.generate_response([{"role": "user", "content": "hi "}], cacheable=True)
+            unsafe = await client.generate_response([{"role": "user", "content": "Hi"}])
+    finally:
+        await server.close()
+
+    assert first["message"] == repeat["message"] == "reply 1"
+    assert unsafe["message"] == "reply 2"
+    assert calls == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bypasses"]) == (1, 1, 1)
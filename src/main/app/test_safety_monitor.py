@@ -0,0 +1,107 @@
+import re
+import pytest
+from app.safety_monitor import SafetyMonitor, CrisisPatternMatcher
+
+MESSAGES = [
+    "Hello, how are you?",
+    "I'm going to the store later",
+    "Sometimes I think about suicide",
+    "I want to die and I wrote a note",
+    "I keep hitting myself when I'm angry",
+    "My partner is hitting me and controlling me",
+    "I thought about self-harm but I'm okay right now",
+    "I feel trapped and I don't want to live anymore",
+    "He's violent, I'm scared of them and I'm about to leave",
+    "I made a plan to end it all tonight",
+    "Work is stressful but I'm managing",
+    "",
+]
+
+@pytest.fixture
+def monitor():
+    return SafetyMonitor()
+
+def legacy_analyze(monitor, message):
+    """Per-pattern search used before the compiled matcher."""
+    message = message.lower()
+    detected = []
+    for risk_type, patterns in monitor.crisis_patterns.items():
+        matches = [pattern for pattern in patterns if re.search(pattern, message)]
+        if matches:
+            detected.append((risk_type, matches))
+    if not detected:
+        return {'risk_level': 'normal', 'risks': []}
+    risk_types = [risk[0] for risk in detected]
+    immediate_risk = any(pattern in message for pattern in monitor.crisis_patterns['emergency'])
+    risk_level = 'high'
+    if immediate_risk or 'suicide_risk' in risk_types:
+        risk_level = 'severe'
+    assessment = {'level': risk_level, 'detected_risks': risk_types, 'immediate_action': immediate_risk}
+    return {
+        'risk_level': risk_level,
+        'risks': risk_types,
+        'immediate_action': immediate_risk,
+        'response': monitor._generate_crisis_response(assessment)
+    }
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_matches_legacy_analysis(monitor, message):
+    assert monitor.analyze_message(message) == legacy_analyze(monitor, message)
+
+def test_detects_overlapping_patterns(monitor):
+    # 'self harm' and 'harm myself' share the word 'harm'
+    detected = monitor._detect_risk_patterns("i think about self harm myself")
+    assert detected == [('self_harm', ['harm myself', r'self[- ]harm'])]
+
+def test_scan_reports_offsets(monitor):
+    message = "i wrote a note about suicide"
+    matches = monitor.matcher.scan(message)
+    assert [(m.category, m.pattern) for m in matches] == [
+        ('emergency', 'wrote a note'), ('suicide_risk', 'suicide')
+    ]
+    assert all(message[m.start:m.end] == m.pattern for m in matches)
+
+def test_matcher_finds_patterns_with_optional_first_character():
+    matcher = CrisisPatternMatcher({'self_harm': [r's?elf harm', r'a*bc']})
+    assert matcher.detect("thinking about elf harm") == [('self_harm', [r's?elf harm'])]
+    assert matcher.detect("just bc") == [('self_harm', [r'a*bc'])]
+
+def test_analyze_messages_batch(monitor):
+    assert monitor.analyze_messages(MESSAGES) == [monitor.analyze_message(m) for m in MESSAGES]
+
+def test_stream_scanner_catches_match_across_chunks(monitor):
+    scanner = monitor.stream_scanner()
+    text = "Honestly, sometimes I think I want to kill myself."
+    chunks = [text[i:i + 4] for i in range(0, len(text), 4)]
+    hits = [scanner.feed(chunk) for chunk in chunks]
+    found = [hit for hit in hits if hit]
+    assert found[0].pattern == 'kill myself'
+    assert text.lower()[found[0].start:found[0].end] == 'kill myself'
+
+def test_stream_scanner_ignores_emergency_phrases_by_default(monitor):
+    scanner = monitor.stream_scanner()
+    assert scanner.feed("I'm going to suggest a breathing exercise right now.") is None
+
+def test_stream_scanner_allows_replies_that_name_crisis_resources(monitor):
+    reply = (
+        "It sounds like a lot right now. If thoughts of suicide or self-harm come up, "
+        "you can call or text the 988 Suicide & Crisis Lifeline any time."
+    )
+    for text in (reply, monitor.crisis_template(['suicide_risk', 'self_harm'], immediate_action=True)):
+        scanner = monitor.stream_scanner()
+        assert not any(scanner.feed(text[i:i + 5]) for i in range(0, len(text), 5))
+
+def test_stream_scanner_keeps_word_boundary_context_across_chunks(monitor):
+    text = "Did Naomi want to diet before the trip?"
+    for split in range(1, len(text)):
+        scanner = monitor.stream_scanner()
+        assert scanner.feed(text[:split]) is None
+        assert scanner.feed(text[split:]) is None, split
+    scanner = monitor.stream_scanner()
+    assert scanner.feed("Did Naomi say that? I want ") is None
+    assert scanner.feed("to die").pattern == r'\bi want to die'
+
+def test_stream_scanner_categories(monitor):
+    assert monitor.stream_scanner(categories=()).feed("I want to kill myself") is None
+    with pytest.raises(ValueError, match="emergency"):
+        monitor.stream_scanner(categories=('suicide_risk', 'emergency'))
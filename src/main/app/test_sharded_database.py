@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+import pytest
+from app.async_database import AsyncDatabase
+from app.models import ChatMessage
+from app.sharded_database import ShardedDatabase
+
+@pytest.fixture
+def sharded(tmp_path):
+    db = ShardedDatabase(str(tmp_path / "shards"), shards=4, max_open=2)
+    yield db
+    db.close()
+
+def test_users_routed_to_their_shard(sharded):
+    for user_id in range(1, 9):
+        sharded.save_turn(user_id, ChatMessage(role="user", content=f"hi from {user_id}", mood="happy"), ChatMessage(role="assistant", content="hello"))
+
+    for user_id in range(1, 9):
+        history = sharded.get_chat_history(user_id)
+        assert [m.content for m in history] == ["hello", f"hi from {user_id}"]
+        assert sharded.get_mood_statistics(user_id) == {"happy": 1}
+    files = sorted(name for name in os.listdir(sharded.directory) if name.endswith(".db"))
+    assert files == ["catalog.db", "shard-000.db", "shard-001.db", "shard-002.db", "shard-003.db"]
+
+def test_open_shards_bounded_by_lru(sharded):
+    for user_id in range(4):
+        sharded.save_chat_message(user_id, ChatMessage(role="user", content="x"))
+    assert len(sharded.open_shards()) == 2
+    sharded.get_chat_history(2)
+    assert sharded.open_shards()[-1] == sharded.shard_path(2)
+    # Reopening an evicted shard sees what was written before it was closed
+    assert len(sharded.get_chat_history(0)) == 1
+
+def test_file_per_user(tmp_path):
+    db = ShardedDatabase(str(tmp_path / "users"), shards=None)
+    db.save_chat_message(42, ChatMessage(role="user", content="private"))
+    assert db.shard_path(42).endswith("user-42.db")
+    assert os.path.exists(db.shard_path(42))
+    assert db.search_history(42, "private")[0].id == 1
+    db.close()
+
+def test_profiles_live_in_catalog(sharded, profile):
+    first = sharded.save_user_profile(profile)
+    second = sharded.save_user_profile(profile)
+    assert second == first + 1
+    assert sharded.get_user_profile(first) == profile
+    assert sharded.open_shards() == []
+
+def test_concurrent_writes_across_shards(sharded):
+    threads = [
+        threading.Thread(target=lambda user_id=user_id: [
+            sharded.save_chat_message(user_id, ChatMessage(role="user", content=f"m{i}")) for i in range(20)
+        ])
+        for user_id in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(len(sharded.get_chat_history(user_id, limit=50)) == 20 for user_id in range(8))
+    assert len(sharded.open_shards()) <= 2
+
+@pytest.mark.asyncio
+async def test_async_database_over_shards(tmp_path, profile):
+    adb = AsyncDatabase(ShardedDatabase(str(tmp_path / "shards"), shards=2), max_writers=2)
+    user_id = await adb.save_user_profile(profile)
+    await asyncio.gather(*[
+        adb.save_turn(user_id + offset, ChatMessage(role="user", content="hi"), ChatMessage(role="assistant", content="hello"))
+        for offset in range(4)
+    ])
+    assert len(await adb.get_chat_history(user_id + 3)) == 2
+    await adb.close()
+
+def test_compaction_covers_every_shard(sharded):
+    for user_id in range(4):
+        with sharded._shard(user_id) as db:
+            with db.get_connection() as conn:
+                conn.execute(
+                    "INSERT INTO chat_history (user_id, role, content, timestamp) VALUES (?, 'user', 'old', '2020-01-01 10:00:00')",
+                    (user_id,)
+                )
+                conn.commit()
+    assert sharded.compact_history(older_than_days=30)["archived_messages"] == 4
+    assert [m.content for m in sharded.iter_chat_history(3, include_archive=True)] == ["old"]
+
+@pytest.mark.asyncio
+async def test_async_export_pages_through_archive_and_shard(tmp_path):
+    db = ShardedDatabase(str(tmp_path / "shards"), shards=2)
+    with db._shard(3) as shard:
+        with shard.get_connection() as conn:
+            conn.execute("INSERT INTO chat_history (user_id, role, content, timestamp) VALUES (3, 'user', 'old', '2020-01-01 10:00:00')")
+            conn.commit()
+    db.compact_history(older_than_days=30)
+    for i in range(5):
+        db.save_chat_message(3, ChatMessage(role="user", content=f"new {i}"))
+    adb = AsyncDatabase(db)
+    exported = [m.content async for m in adb.iter_chat_history(3, batch_size=2, include_archive=True)]
+    assert exported == ["old"] + [f"new {i}" for i in range(5)]
+    # The export released the shard when it finished
+    assert db._in_use == {}
+    await adb.close()
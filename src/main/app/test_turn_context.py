@@ -0,0 +1,41 @@
+from app.safety_monitor import SafetyMonitor
+from app.turn_context import TurnAnalyzer
+
+class CountingMonitor(SafetyMonitor):
+    def __init__(self):
+        super().__init__()
+        self.analyzed = []
+
+    def analyze_message(self, message):
+        self.analyzed.append(message)
+        return super().analyze_message(message)
+
+def test_repeated_text_is_analyzed_once():
+    monitor = CountingMonitor()
+    analyzer = TurnAnalyzer(monitor)
+    first = analyzer.analyze("I want to kill myself", mood="sad")
+    second = analyzer.analyze("I want to kill myself")
+    assert monitor.analyzed == ["I want to kill myself"]
+    assert second.safety_check == first.safety_check
+    assert (first.mood, second.mood) == ("sad", None)
+
+def test_least_recently_used_entry_is_evicted():
+    monitor = CountingMonitor()
+    analyzer = TurnAnalyzer(monitor, max_entries=2)
+    analyzer.analyze("one")
+    analyzer.analyze("two")
+    analyzer.analyze("one")  # hit, moves "one" to the end
+    analyzer.analyze("three")  # evicts "two"
+    assert len(analyzer._memo) == 2
+    analyzer.analyze("one")
+    analyzer.analyze("two")
+    assert monitor.analyzed == ["one", "two", "three", "two"]
+
+def test_turns_do_not_share_mutable_safety_checks():
+    analyzer = TurnAnalyzer(SafetyMonitor())
+    first = analyzer.analyze("I want to kill myself")
+    first.crisis_resources.append("edited")
+    first.safety_check['risks'].clear()
+    second = analyzer.analyze("I want to kill myself")
+    assert "edited" not in second.crisis_resources
+    assert second.safety_check['risks'] == ['suicide_risk']
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import copy
+import hashlib
+from .safety_monitor import SafetyMonitor
+
+@dataclass
+class TurnContext:
+    """Analysis of one chat turn, computed once and shared by every step of the turn."""
+    message: str
+    mood: Optional[str]
+    safety_check: Dict
+    # Templated crisis message, ready before any LLM call on high/severe turns
+    crisis_message: Optional[str] = None
+
+    @property
+    def risk_level(self) -> str:
+        return self.safety_check['risk_level']
+
+    @property
+    def is_crisis(self) -> bool:
+        return self.risk_level in ['high', 'severe']
+
+    @property
+    def crisis_resources(self) -> Optional[List[str]]:
+        if self.risk_level == 'normal':
+            return None
+        return self.safety_check.get('response', {}).get('resources', [])
+
+class TurnAnalyzer:
+    """Builds TurnContext objects, memoizing analyzer output for repeated message text.
+
+    Each turn gets its own copy of the memoized safety check, so a caller that
+    edits it (e.g. its resource list) cannot change later turns.
+    """
+
+    def __init__(self, safety_monitor: SafetyMonitor, max_entries: int = 256):
+        self.safety_monitor = safety_monitor
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def analyze(self, message: str, mood: Optional[str] = None) -> TurnContext:
+        key = hashlib.sha256(message.encode('utf-8')).hexdigest()
+        safety_check = self._memo.get(key)
+        if safety_check is None:
+            safety_check = self.safety_monitor.analyze_message(message)
+            self._memo[key] = safety_check
+            if len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(key)
+        turn = TurnContext(message=message, mood=mood, safety_check=copy.deepcopy(safety_check))
+        if turn.is_crisis:
+            turn.crisis_message = self.safety_monitor.crisis_template(
+                safety_check['risks'], safety_check.get('immediate_action', False)
+            )
+        return turn
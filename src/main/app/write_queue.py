@@ -0,0 +1,110 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WriteBehindError(RuntimeError):
+    """Raised by flush() and close() when rows submitted earlier were never committed."""
+
+class WriteBehindQueue:
+    """Collects rows from many concurrent turns and writes them in one group commit.
+
+    A background thread drains the queue and calls ``write_rows`` once per batch.
+    A batch is flushed when it reaches ``max_batch`` rows, when ``max_delay``
+    seconds have passed since its first row, on ``flush()`` and on ``close()``.
+
+    A failed group commit is retried once. If the retry fails too, the batch is
+    dropped and the next ``flush()`` or ``close()`` raises WriteBehindError.
+    """
+
+    def __init__(
+        self,
+        write_rows: Callable[[List[tuple]], None],
+        max_batch: int = 256,
+        max_delay: float = 0.05
+    ):
+        self.write_rows = write_rows
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._failure_lock = threading.Lock()
+        self._lost_rows = 0
+        self._last_error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: List[tuple]):
+        self._queue.put(rows)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every row submitted so far is committed or dropped.
+
+        Raises WriteBehindError if rows were dropped since the last check."""
+        done = threading.Event()
+        self._queue.put(done)
+        flushed = done.wait(timeout)
+        self._raise_for_lost_rows()
+        return flushed
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_for_lost_rows()
+
+    def _raise_for_lost_rows(self):
+        with self._failure_lock:
+            lost, error = self._lost_rows, self._last_error
+            self._lost_rows, self._last_error = 0, None
+        if lost:
+            raise WriteBehindError(f"{lost} queued chat rows were not written: {error}") from error
+
+    def _commit(self, batch: List[tuple]):
+        for attempt in (1, 2):
+            try:
+                self.write_rows(batch)
+                return
+            except Exception as e:
+                logger.error(f"Group commit of {len(batch)} rows failed (attempt {attempt}): {e}")
+                error = e
+        with self._failure_lock:
+            self._lost_rows += len(batch)
+            self._last_error = error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch: List[tuple] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    # A flush request ends the batch so the caller is released promptly
+                    waiters.append(item)
+                    break
+                batch.extend(item)
+                if len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._commit(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return